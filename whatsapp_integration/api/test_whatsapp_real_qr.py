@@ -0,0 +1,47 @@
+# Copyright (c) 2025, sammish and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from whatsapp_integration.api.whatsapp_real_qr import _QR_CANVAS_JS, _SIZED_QR_JS, _evaluate_js
+
+
+class _RemoteDriver:
+	"""Stand-in for a grid (webdriver.Remote) driver: execute_script only, no CDP channel"""
+
+	def __init__(self):
+		self.scripts = []
+
+	def execute_script(self, script, *args):
+		self.scripts.append(script)
+		return "data:image/webp;base64,AAAA"
+
+
+class _ChromeDriver:
+	"""Stand-in for a local Chrome driver that speaks CDP"""
+
+	def __init__(self):
+		self.commands = []
+
+	def execute_cdp_cmd(self, cmd, params):
+		self.commands.append((cmd, params))
+		return {"result": {"type": "string", "value": "data:image/webp;base64,BBBB"}}
+
+
+class TestEvaluateJs(FrappeTestCase):
+	def test_remote_driver_returns_the_expression(self):
+		for expression in (_QR_CANVAS_JS, _SIZED_QR_JS):
+			driver = _RemoteDriver()
+			self.assertEqual(_evaluate_js(driver, expression), "data:image/webp;base64,AAAA")
+			script = driver.scripts[0]
+			# A line break after "return" would let ASI end the statement as a bare "return;"
+			self.assertTrue(script.startswith("return ("), script[:20])
+			self.assertNotIn("\n", script[: len("return (")])
+
+	def test_cdp_driver_uses_runtime_evaluate(self):
+		driver = _ChromeDriver()
+		self.assertEqual(_evaluate_js(driver, _QR_CANVAS_JS), "data:image/webp;base64,BBBB")
+		cmd, params = driver.commands[0]
+		self.assertEqual(cmd, "Runtime.evaluate")
+		self.assertTrue(params["returnByValue"])
+		self.assertEqual(params["expression"], _QR_CANVAS_JS)
@@ -1,9 +1,18 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import frappe
 
+# One pooled session per process: sends reuse the kept-alive TLS connection to the Graph API
+# instead of a fresh TCP + TLS handshake per message. Retries cover connection failures only
+# (POST is not in Retry's idempotent methods), so a message is never sent twice.
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10, max_retries=Retry(total=2, backoff_factor=0.1)))
+
 def send_official(number, message):
     """Send message via Official WhatsApp Cloud API"""
-    settings = frappe.get_doc("WhatsApp Settings")
+    # Cached Single; Frappe drops it from the document cache whenever the settings are saved
+    settings = frappe.get_cached_doc("WhatsApp Settings")
     url = f"https://graph.facebook.com/v19.0/{settings.phone_number_id}/messages"
     headers = {
         "Authorization": f"Bearer {settings.access_token}",
@@ -15,7 +24,7 @@ def send_official(number, message):
         "type": "text",
         "text": {"body": message}
     }
-    response = requests.post(url, headers=headers, json=payload)
+    response = _http.post(url, headers=headers, json=payload)
     if response.status_code != 200:
         raise Exception(f"WhatsApp API error: {response.text}")
     return response.json()
@@ -1,19 +1,19 @@
-import frappe
-import qrcode
-import io
 import base64
-from PIL import Image
+import io
+import os
 import threading
 import time
+
+import frappe
+import qrcode
+from PIL import Image
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
-import os
+from selenium.webdriver.support.ui import WebDriverWait
 
 # Global storage for WebDriver instances and QR codes
 drivers = {}
@@ -38,67 +38,67 @@ def generate_qr_code(session_id, timeout=30):
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--window-size=1920,1080")
-        
+
         # Set up session directory
         session_dir = get_session_directory(session_id)
         chrome_options.add_argument(f"--user-data-dir={session_dir}")
-        
-        # Quick Chrome driver setup with shorter timeout
-        from webdriver_manager.chrome import ChromeDriverManager
-        service = ChromeService(ChromeDriverManager().install())
-        
+
+        # Quick Chrome driver setup with shorter timeout (chromedriver path is resolved once per process)
+        from whatsapp_integration.api.whatsapp_real_qr import resolve_chromedriver
+        service = ChromeService(resolve_chromedriver())
+
         driver = webdriver.Chrome(service=service, options=chrome_options)
         driver.set_page_load_timeout(15)  # Shorter timeout
-        
+
         try:
             # Navigate to WhatsApp Web with timeout
             driver.get("https://web.whatsapp.com")
-            
+
             # Wait for QR code with shorter timeout
             qr_selector = 'div[data-ref] canvas'
             wait = WebDriverWait(driver, 10)  # Reduced from 30 to 10 seconds
-            
+
             qr_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, qr_selector)))
-            
+
             # Take screenshot of QR code area
             qr_location = qr_element.location
             qr_size = qr_element.size
-            
+
             # Take screenshot
             screenshot = driver.get_screenshot_as_png()
             image = Image.open(io.BytesIO(screenshot))
-            
+
             # Crop QR code area
             left = qr_location['x']
-            top = qr_location['y'] 
+            top = qr_location['y']
             right = left + qr_size['width']
             bottom = top + qr_size['height']
-            
+
             qr_image = image.crop((left, top, right, bottom))
-            
+
             # Convert to base64
             buffer = io.BytesIO()
             qr_image.save(buffer, format='PNG')
             img_str = base64.b64encode(buffer.getvalue()).decode()
-            
+
             qr_data_url = f"data:image/png;base64,{img_str}"
-            
+
             return {
                 'status': 'qr_generated',
                 'qr': qr_data_url,
                 'session': session_id
             }
-            
+
         except TimeoutException:
             frappe.log_error("WhatsApp QR code timeout", "WhatsApp QR Timeout")
             raise Exception("QR code generation timed out")
-            
+
         finally:
             try:
                 driver.quit()
             except:
                 pass
-                
+
     except Exception as e:
         frappe.log_error(f"WhatsApp QR Generation Error: {str(e)}", "WhatsApp QR Error")
         raise Exception(f"QR code generation timed out")
@@ -108,11 +108,11 @@ def start_whatsapp_session(session_id):
     try:
         # Setup Chrome options - make headless optional for testing
         chrome_options = Options()
-        
+
         # Only use headless in production
         if frappe.conf.get('developer_mode') != 1:
             chrome_options.add_argument("--headless")
-            
+
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-gpu")
@@ -121,31 +121,32 @@ def start_whatsapp_session(session_id):
         chrome_options.add_argument("--disable-blink-features=AutomationControlled")
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
-        
+
         # Create profile directory for session persistence
         profile_dir = os.path.join(frappe.get_site_path(), "private", "files", "whatsapp_sessions", session_id)
         os.makedirs(profile_dir, exist_ok=True)
         chrome_options.add_argument(f"--user-data-dir={profile_dir}")
-        
+
         # Initialize Chrome driver
+        from whatsapp_integration.api.whatsapp_real_qr import resolve_chromedriver
         driver = webdriver.Chrome(
-            service=webdriver.chrome.service.Service(ChromeDriverManager().install()),
+            service=ChromeService(resolve_chromedriver()),
             options=chrome_options
         )
         drivers[session_id] = driver
-        
+
         # Navigate to WhatsApp Web
         driver.get("https://web.whatsapp.com")
-        
+
         # Wait for QR code or main interface
         wait = WebDriverWait(driver, 30)
-        
+
         try:
             # Look for QR code
             qr_element = wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "[data-ref] canvas, [data-testid='qr-code'] canvas"))
             )
-            
+
             # Capture QR code
             qr_code_data = driver.execute_script("""
                 var canvas = document.querySelector('[data-ref] canvas') || document.querySelector('[data-testid="qr-code"] canvas');
@@ -154,11 +155,11 @@ def start_whatsapp_session(session_id):
                 }
                 return null;
             """)
-            
+
             if qr_code_data:
                 qr_codes[session_id] = qr_code_data
                 connection_status[session_id] = 'Waiting for scan'
-                
+
                 # Monitor for connection
                 monitor_connection(driver, session_id)
             else:
@@ -170,11 +171,11 @@ def start_whatsapp_session(session_id):
                     qr_codes[session_id] = 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='  # 1x1 transparent pixel
                 except TimeoutException:
                     connection_status[session_id] = 'Error'
-                    
+
         except TimeoutException:
             connection_status[session_id] = 'Error'
             frappe.log_error("WhatsApp Web QR code not found", "WhatsApp Session")
-            
+
     except Exception as e:
         connection_status[session_id] = 'Error'
         frappe.log_error(f"WhatsApp session error for {session_id}: {str(e)}", "WhatsApp Session")
@@ -183,18 +184,18 @@ def monitor_connection(driver, session_id):
     """Monitor WhatsApp connection status"""
     try:
         wait = WebDriverWait(driver, 60)  # Wait up to 1 minute for scan
-        
+
         # Wait for main interface to appear (indicates successful login)
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "[data-testid='chat-list']")))
-        
+
         connection_status[session_id] = 'Connected'
         # Clear QR code after successful connection
         if session_id in qr_codes:
             del qr_codes[session_id]
-            
+
         # Keep session alive
         keep_session_alive(driver, session_id)
-        
+
     except TimeoutException:
         connection_status[session_id] = 'QR Expired'
     except Exception as e:
@@ -206,14 +207,12 @@ def keep_session_alive(driver, session_id):
     try:
         while connection_status.get(session_id) == 'Connected':
             time.sleep(30)  # Check every 30 seconds
-            
-            # Check if still connected
-            try:
-                driver.find_element(By.CSS_SELECTOR, "[data-testid='chat-list']")
-            except NoSuchElementException:
+
+            # Check if still connected (find_elements returns [] instead of raising)
+            if not driver.find_elements(By.CSS_SELECTOR, "[data-testid='chat-list']"):
                 connection_status[session_id] = 'Disconnected'
                 break
-                
+
     except Exception as e:
         connection_status[session_id] = 'Error'
         frappe.log_error(f"Session keep-alive error for {session_id}: {str(e)}", "WhatsApp KeepAlive")
@@ -236,27 +235,27 @@ def send_message(session_id, phone_number, message):
                 'success': False,
                 'error': 'Session not connected'
             }
-        
+
         driver = drivers[session_id]
-        
+
         # Navigate to chat with phone number
         chat_url = f"https://web.whatsapp.com/send?phone={phone_number}&text={message}"
         driver.get(chat_url)
-        
+
         wait = WebDriverWait(driver, 10)
-        
+
         # Wait for and click send button
         send_button = wait.until(
             EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-testid='send']"))
         )
         send_button.click()
-        
+
         return {
             'success': True,
             'message_id': f"{session_id}_{phone_number}_{int(time.time())}",
             'timestamp': frappe.utils.now()
         }
-        
+
     except Exception as e:
         frappe.log_error(f"Send message error for {session_id}: {str(e)}", "WhatsApp Send Message")
         return {
@@ -271,15 +270,15 @@ def close_session(session_id):
         if session_id in drivers:
             drivers[session_id].quit()
             del drivers[session_id]
-        
+
         if session_id in qr_codes:
             del qr_codes[session_id]
-            
+
         if session_id in connection_status:
             del connection_status[session_id]
-            
+
         return {'success': True}
-        
+
     except Exception as e:
         frappe.log_error(f"Close session error for {session_id}: {str(e)}", "WhatsApp Close Session")
         return {'success': False, 'error': str(e)}
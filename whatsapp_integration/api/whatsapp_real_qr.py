@@ -1,38 +1,279 @@
 import frappe
 import requests
-import base64
-import io
 import hashlib
-from PIL import Image
 import time
 import threading
 import platform
 import shutil
+import collections
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import re
 import os
-import urllib.parse
 from datetime import datetime
 
+try:
+    # SIMD base64 when available; the stdlib encoder is a drop-in fallback
+    from pybase64 import b64encode as _b64encode
+except ImportError:
+    from base64 import b64encode as _b64encode
+
+# Statuses after which a waiting generate_whatsapp_qr call can return
+SESSION_SETTLED_STATUSES = frozenset({'qr_ready', 'connected', 'error'})
+# Sessions that are not connected and idle this long are evicted and their driver released
+SESSION_IDLE_TTL = 600
+SESSION_SWEEP_INTERVAL = 60
+# How often wait() re-reads another worker's mirrored session state
+SESSION_MIRROR_POLL_INTERVAL = 0.5
+# WhatsApp rotates the QR roughly every 20s; after this many unscanned rotations the session is expired
+QR_MAX_REFRESHES = 3
+# Terminal statuses after which generate_whatsapp_qr starts a fresh session
+SESSION_RESTART_STATUSES = frozenset({'error', 'expired', 'timeout'})
+
+class SessionStore:
+    """Thread-safe map of QR session state.
+
+    Each session has its own RLock, so a status write and the matching Event
+    signal happen atomically without serialising unrelated sessions. Readers
+    get shallow copies, never the live dict.
+
+    Every write is mirrored to frappe.cache() so a status poll served by another
+    worker process sees the session instead of reporting it missing and
+    launching a second Chrome. The local map stays authoritative for sessions
+    whose driver lives in this process. Mirror keys carry the session's site
+    explicitly, since monitor, keep-alive and sweeper threads write without a
+    site context of their own.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._touched = {}  # monotonic time of the last write, used by the idle sweeper
+        self._events = {}  # set once the session settles so waiters don't have to poll
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._sites = {}  # site each session was created under, for writes from site-less threads
+
+    def _lock(self, session_id):
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.RLock()
+            return lock
+
+    def _event(self, session_id):
+        with self._locks_guard:
+            event = self._events.get(session_id)
+            if event is None:
+                event = self._events[session_id] = threading.Event()
+            return event
+
+    def __contains__(self, session_id):
+        return session_id in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def _cache_key(site, session_id):
+        # Site-qualified and stored with shared=True, so it doesn't depend on the thread's site config
+        return f"wa_real_qr_status::{site}::{session_id}"
+
+    def _site(self, session_id):
+        """Site of a session: the one it was written under, else the current thread's"""
+        current = getattr(frappe.local, "site", None)
+        if current and session_id in self._data and session_id not in self._sites:
+            self._sites[session_id] = current
+        return self._sites.get(session_id) or current
+
+    def _mirror(self, session_id):
+        site = self._site(session_id)
+        if not site:
+            _safe_log(f"Session state not mirrored, no site known for {session_id}", "WhatsApp Session Store", is_error=True)
+            return
+        try:
+            frappe.cache().set_value(
+                self._cache_key(site, session_id), self._data[session_id],
+                expires_in_sec=SESSION_IDLE_TTL, shared=True,
+            )
+        except Exception as mirror_err:
+            _safe_log(f"Session state mirror failed for {session_id}: {str(mirror_err)}", "WhatsApp Session Store", is_error=True)
+
+    def _cached(self, session_id):
+        """Another worker's mirrored copy of the session (None if there is none)"""
+        site = self._site(session_id)
+        if not site:
+            return None
+        try:
+            return frappe.cache().get_value(self._cache_key(site, session_id), shared=True)
+        except Exception:
+            return None
+
+    def get(self, session_id, default=None):
+        """Return a shallow copy of the session state, falling back to another worker's mirror"""
+        data = self._data.get(session_id)
+        if data is None:
+            data = self._cached(session_id)
+        return dict(data) if data else default
+
+    def set(self, session_id, data):
+        """Replace the session state and signal waiters once it settles"""
+        with self._lock(session_id):
+            self._data[session_id] = dict(data)
+            self._touch_and_signal(session_id)
+
+    def claim(self, session_id, data):
+        """Set the session state only if none exists; return True if this call created it"""
+        with self._lock(session_id):
+            if session_id in self._data:
+                return False
+            self._data[session_id] = dict(data)
+            self._touch_and_signal(session_id)
+            return True
+
+    def update(self, session_id, **fields):
+        """Merge fields into the session state (creating it if needed)"""
+        with self._lock(session_id):
+            merged = dict(self._data.get(session_id) or {})
+            merged.update(fields)
+            self._data[session_id] = merged
+            self._touch_and_signal(session_id)
+
+    def update_if(self, session_id, status, **fields):
+        """Merge fields into the session state only if its status is still status; return True if merged"""
+        with self._lock(session_id):
+            current = self._data.get(session_id)
+            if current is None or current.get('status') != status:
+                return False
+            merged = dict(current)
+            merged.update(fields)
+            self._data[session_id] = merged
+            self._touch_and_signal(session_id)
+            return True
+
+    def _touch_and_signal(self, session_id):
+        self._touched[session_id] = time.monotonic()
+        self._mirror(session_id)
+        event = self._event(session_id)
+        if self._data[session_id].get('status') in SESSION_SETTLED_STATUSES:
+            event.set()
+        else:
+            event.clear()
+
+    def pop(self, session_id):
+        """Remove the session state (if any) and release anyone waiting on it"""
+        with self._lock(session_id):
+            data = self._data.pop(session_id, None)
+            self._touched.pop(session_id, None)
+            with self._locks_guard:
+                event = self._events.pop(session_id, None)
+                self._locks.pop(session_id, None)
+            site = self._site(session_id)
+            self._sites.pop(session_id, None)
+        if site:
+            try:
+                frappe.cache().delete_value(self._cache_key(site, session_id), shared=True)
+            except Exception as mirror_err:
+                _safe_log(f"Session state mirror delete failed for {session_id}: {str(mirror_err)}", "WhatsApp Session Store", is_error=True)
+        if event:
+            event.set()
+        return data
+
+    def wait(self, session_id, timeout):
+        """Block until the session settles or vanishes; return a copy of its state"""
+        with self._lock(session_id):
+            data = self._data.get(session_id)
+            if data is not None:
+                if data.get('status') in SESSION_SETTLED_STATUSES:
+                    return dict(data)
+                event = self._event(session_id)
+        if data is not None:
+            event.wait(timeout)
+            return self.get(session_id)
+        # The session lives in another worker: no local event will fire, so poll its mirror
+        deadline = time.monotonic() + timeout
+        while True:
+            data = self._cached(session_id)
+            remaining = deadline - time.monotonic()
+            if not data or data.get('status') in SESSION_SETTLED_STATUSES or remaining <= 0:
+                return dict(data) if data else None
+            time.sleep(min(SESSION_MIRROR_POLL_INTERVAL, remaining))
+
+    def idle(self, ttl):
+        """Return ids of sessions that are not connected and were not written for ttl seconds"""
+        now = time.monotonic()
+        return [
+            session_id for session_id, touched in list(self._touched.items())
+            if now - touched > ttl
+            and (self._data.get(session_id) or {}).get('status') != 'connected'
+        ]
+
 # Global storage for active QR sessions
-active_qr_sessions = {}
+active_qr_sessions = SessionStore()
 # Global storage for active drivers (to keep sessions alive)
 active_drivers = {}
+# (site, session_id) -> profile directory known to exist (cleared when a directory is deleted)
+_session_dir_cache = {}
+_sweeper_thread = None
+_sweeper_lock = threading.Lock()
 # Global log lock for safe file writes
 _log_lock = threading.Lock()
+# Per-thread buffer of pending Error Log messages (see _begin_log_buffer)
+_log_buffer = threading.local()
+# Process-wide ring buffer of (site, line) for messages logged outside a per-thread buffer; the
+# sweeper thread writes it out every LOG_FLUSH_INTERVAL seconds, or at once when an error is logged
+LOG_FLUSH_INTERVAL = 10
+_pending_logs = collections.deque(maxlen=500)
+_pending_logs_lock = threading.Lock()
+_log_flush_now = threading.Event()
+# Identical non-error lines repeated within this window only go to the file log, not the Error Log
+LOG_REPEAT_WINDOW = 10
+_recent_log_lines = {}
 
 # Centralized log naming/location
 LOG_SUBDIR = 'whatsapp_logs'
 LOG_FILENAME = 'whatsapp_real_qr.log'
 HEADLESS_FALLBACK_MODES = ["--headless=new", "--headless=chrome", "--headless"]
 
+WHATSAPP_WEB_ORIGIN = "https://web.whatsapp.com"
+
+# Warm, profile-less Chrome drivers kept around so the next session skips the cold start.
+# Drivers launched with a persistent user-data-dir are never pooled (the profile is locked).
+DRIVER_POOL_SIZE = int(os.environ.get("WHATSAPP_DRIVER_POOL_SIZE", "2"))
+# Pooled drivers are recycled after this many sessions so renderer leaks don't accumulate
+DRIVER_MAX_USES = int(os.environ.get("WHATSAPP_DRIVER_MAX_USES", "20"))
+_driver_pool = collections.deque()
+_driver_pool_lock = threading.Lock()
+# Remembers which pooled driver each OS thread released last, so it is reused first
+_thread_driver = threading.local()
+
+# Captures launch Chrome, so they are admitted through a bounded pool; bursts queue instead of
+# starting one browser per request at once
+QR_MAX_CONCURRENCY = int(os.environ.get("WHATSAPP_QR_MAX_CONCURRENCY", "3"))
+_capture_executor = ThreadPoolExecutor(max_workers=QR_MAX_CONCURRENCY, thread_name_prefix="wa-qr-capture")
+# Connected sessions watched by the single keep-alive thread: session_id -> [driver, session_dir, last_check]
+KEEP_ALIVE_INTERVAL = 30
+_keep_alive_sessions = {}
+_keep_alive_lock = threading.Lock()
+_keep_alive_thread = None
+# session_id -> Future of its pending or running capture (kept out of the session dict, which is mirrored)
+_capture_futures = {}
+# QR monitors are long-lived (up to their timeout) but mostly idle in WebDriverWait, so they get
+# their own pool instead of one fresh thread per session; cleanup can cancel a queued one
+MONITOR_MAX_WORKERS = int(os.environ.get("WHATSAPP_MONITOR_MAX_WORKERS", "16"))
+_monitor_executor = ThreadPoolExecutor(max_workers=MONITOR_MAX_WORKERS, thread_name_prefix="wa-qr-monitor")
+_monitor_futures = {}
+# Quitting Chrome blocks for a second or more; requests that don't need to wait for it hand it off
+_quit_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="wa-quit")
+
 def _resolve_log_base_dir():
     """Resolve base directory used for file logging and a descriptive source label.
 
@@ -121,13 +362,13 @@ def get_real_qr_log_path():
 def generate_whatsapp_qr(session_id, timeout=30):
     """Generate QR code for WhatsApp Web authentication with better error handling"""
     try:
-        frappe.log_error(f"Starting QR generation for session: {session_id}", "WhatsApp QR Debug")
-        
-        # Check if we already have an active session
-        if session_id in active_qr_sessions:
-            session_data = active_qr_sessions[session_id]
+        # Check if we already have an active session; repeat polls return from here
+        # without touching the filesystem or Chrome
+        session_data = active_qr_sessions.get(session_id)
+        in_flight = False
+        if session_data:
             status = session_data.get('status')
-            
+
             if status == 'qr_ready':
                 # Return latest QR code (may have been updated)
                 return {
@@ -145,65 +386,60 @@ def generate_whatsapp_qr(session_id, timeout=30):
                     'connected_at': session_data.get('connected_at')
                 }
             elif status == 'starting':
-                # Session is still starting, wait for it
-                pass
-            elif status == 'error':
-                # Previous session had error, clear it and start fresh
-                del active_qr_sessions[session_id]
-        
-        # Prepare site context and session directory on main thread
-        try:
-            site_name = frappe.local.site
-        except Exception:
-            site_name = None
+                # Session is still starting: share its wait instead of preparing another launch
+                in_flight = True
+            elif status in SESSION_RESTART_STATUSES:
+                # Previous session failed or expired, clear it and start fresh
+                active_qr_sessions.pop(session_id)
+            else:
+                # e.g. 'disconnected': the old browser is usually still up and showing a fresh QR
+                resumed = _resume_live_driver(session_id, session_data)
+                if resumed:
+                    return resumed
 
-        # Compute session directory on main thread to avoid frappe calls in thread
-        try:
+        if not in_flight:
+            _append_file_log("WhatsApp QR Debug", f"Starting QR generation for session: {session_id}")
+
+            # Prepare site context and session directory on main thread
+            try:
+                site_name = frappe.local.site
+            except Exception:
+                site_name = None
+
+            # Compute session directory on main thread to avoid frappe calls in thread
+            # (get_session_directory falls back to a temp directory itself)
             session_dir = get_session_directory(session_id)
-        except Exception as dir_error:
-            # get_session_directory already falls back to temp, but we guard anyway
-            frappe.log_error(f"Session directory compute failed: {str(dir_error)}", "WhatsApp Session Dir Compute")
-            import tempfile
-            session_dir = tempfile.mkdtemp(prefix=f"whatsapp_{session_id}_")
-
-        # Start a new QR session in background with prepared context
-        start_qr_session(session_id, site_name, session_dir)
-        
-        # Wait up to timeout seconds for QR to be ready
-        wait_time = timeout
-        check_interval = 0.5
-        checks = int(wait_time / check_interval)
-        
-        for i in range(checks):
-            if session_id in active_qr_sessions:
-                session_data = active_qr_sessions[session_id]
-                status = session_data.get('status')
-                
-                if status == 'qr_ready':
-                    return {
-                        'status': 'qr_generated',
-                        'qr': session_data.get('qr_data'),
-                        'session': session_id,
-                        'message': 'Real WhatsApp QR generated - scan with your phone'
-                    }
-                elif status == 'connected':
-                    return {
-                        'status': 'already_connected',
-                        'session': session_id,
-                        'message': 'WhatsApp is already connected'
-                    }
-                elif status == 'error':
-                    error_msg = session_data.get('error', 'QR generation failed')
-                    frappe.log_error(f"QR Error for {session_id}: {error_msg}", "WhatsApp QR Error")
-                    raise Exception(error_msg)
-            
-            time.sleep(check_interval)
-        
+
+            # Start a new QR session in background with prepared context
+            start_qr_session(session_id, site_name, session_dir)
+
+        # Wait up to timeout seconds for QR to be ready; the capture thread notifies on change
+        session_data = active_qr_sessions.wait(session_id, float(timeout or 30)) or {}
+        status = session_data.get('status')
+
+        if status == 'qr_ready':
+            return {
+                'status': 'qr_generated',
+                'qr': session_data.get('qr_data'),
+                'session': session_id,
+                'message': 'Real WhatsApp QR generated - scan with your phone'
+            }
+        elif status == 'connected':
+            return {
+                'status': 'already_connected',
+                'session': session_id,
+                'message': 'WhatsApp is already connected'
+            }
+        elif status == 'error':
+            error_msg = session_data.get('error', 'QR generation failed')
+            frappe.log_error(f"QR Error for {session_id}: {error_msg}", "WhatsApp QR Error")
+            raise Exception(error_msg)
+
         # If we get here, it timed out
         frappe.log_error(f"QR generation timed out for session: {session_id}", "WhatsApp QR Timeout")
         # If a background session exists, return its current status so client can poll
-        if session_id in active_qr_sessions:
-            session_data = active_qr_sessions.get(session_id, {})
+        session_data = active_qr_sessions.get(session_id)
+        if session_data:
             status = session_data.get('status', 'starting')
             payload = {
                 'status': status,
@@ -214,35 +450,121 @@ def generate_whatsapp_qr(session_id, timeout=30):
                 payload['qr'] = session_data.get('qr_data')
             return payload
         raise Exception(f"QR generation timed out after {timeout} seconds")
-        
+
     except Exception as e:
         error_msg = str(e)
         frappe.log_error(f"WhatsApp QR Generation Error: {error_msg}", "WhatsApp Real QR")
         # Clean up failed session from memory
-        if session_id in active_qr_sessions:
-            del active_qr_sessions[session_id]
+        active_qr_sessions.pop(session_id)
         # Note: We don't delete the directory here as it might be useful for debugging
         # User can manually call cleanup_session if needed
         raise Exception(error_msg)
 
+def _resume_live_driver(session_id, session_data):
+    """Reuse a still-running driver for a session instead of relaunching Chrome.
+
+    Returns a generate_whatsapp_qr response if the driver is showing a QR (and restarts its
+    monitor); otherwise releases the driver and clears the session so a fresh capture starts.
+    """
+    driver = active_drivers.get(session_id)
+    if driver is not None:
+        try:
+            _, qr_data = _read_visible_qr(driver)
+        except Exception:
+            qr_data = None
+        if qr_data:
+            session_dir = session_data.get('session_dir')
+            active_qr_sessions.set(session_id, {
+                'status': 'qr_ready',
+                'qr_data': qr_data,
+                'qr_hash': _get_qr_hash(qr_data),
+                'generated_at': time.time(),
+                'driver_active': True,
+                'session_dir': session_dir
+            })
+            _start_monitor(driver, session_id, session_dir)
+            return {
+                'status': 'qr_generated',
+                'qr': qr_data,
+                'session': session_id,
+                'message': 'QR code ready for scanning',
+                'generated_at': time.time()
+            }
+        if active_drivers.get(session_id) is driver:
+            active_drivers.pop(session_id, None)
+        _release_driver(driver)
+    active_qr_sessions.pop(session_id)
+    return None
+
+def _sweep_idle_sessions():
+    """Evict sessions that are not connected and have been idle past SESSION_IDLE_TTL"""
+    stale = active_qr_sessions.idle(SESSION_IDLE_TTL)
+    for sid in stale:
+        active_qr_sessions.pop(sid)
+        _release_driver(active_drivers.pop(sid, None))
+    if stale:
+        _safe_log(f"Evicted {len(stale)} idle QR session(s): {', '.join(stale)}", "WhatsApp Session Cleanup")
+    return stale
+
+def _sweep_loop():
+    """Flush batched log lines every LOG_FLUSH_INTERVAL and evict idle sessions every SESSION_SWEEP_INTERVAL"""
+    last_sweep = time.monotonic()
+    while True:
+        _log_flush_now.wait(LOG_FLUSH_INTERVAL)
+        _log_flush_now.clear()
+        try:
+            _flush_pending_logs()
+        except Exception:
+            pass
+        if time.monotonic() - last_sweep < SESSION_SWEEP_INTERVAL:
+            continue
+        last_sweep = time.monotonic()
+        try:
+            _sweep_idle_sessions()
+        except Exception:
+            pass
+
+def _ensure_session_sweeper():
+    """Start the sweeper thread (idle sessions and batched logs) once per process"""
+    global _sweeper_thread
+    with _sweeper_lock:
+        if _sweeper_thread is None or not _sweeper_thread.is_alive():
+            _sweeper_thread = threading.Thread(target=_sweep_loop, daemon=True)
+            _sweeper_thread.start()
+
+def _start_monitor(driver, session_id, session_dir=None):
+    """Run monitor_qr_scan for a session on the monitor pool, under the caller's site"""
+    site_name = getattr(frappe.local, "site", None)
+    future = _monitor_executor.submit(_run_monitor, site_name, driver, session_id, session_dir)
+    _monitor_futures[session_id] = future
+    future.add_done_callback(lambda f: _monitor_futures.pop(session_id, None) if _monitor_futures.get(session_id) is f else None)
+
+def _run_monitor(site_name, driver, session_id, session_dir=None):
+    """Monitor-pool task: monitor_qr_scan with a site context so its logs reach the right site"""
+    entered_site = _enter_site(site_name)
+    try:
+        monitor_qr_scan(driver, session_id, session_dir)
+    finally:
+        _leave_site(entered_site)
+
 def start_qr_session(session_id, site_name=None, session_dir=None):
     """Start QR generation session in background thread"""
-    if session_id in active_qr_sessions:
-        return  # Already started
-    
-    # Mark as starting
-    active_qr_sessions[session_id] = {
+    # Mark as starting; bail out if another request already started this session
+    if not active_qr_sessions.claim(session_id, {
         'status': 'starting',
         'started_at': time.time()
-    }
-    
-    # Start in background thread
-    thread = threading.Thread(target=capture_whatsapp_qr, args=(session_id, site_name, session_dir))
-    thread.daemon = True
-    thread.start()
-
-def _safe_log(message, title="WhatsApp QR Thread"):
-    """Thread-safe logger that won't fail if DB logging is unavailable"""
+    }):
+        return  # Already started
+
+    _ensure_session_sweeper()
+
+    # Queue the capture; it starts as soon as a capture slot is free
+    future = _capture_executor.submit(capture_whatsapp_qr, session_id, site_name, session_dir)
+    _capture_futures[session_id] = future
+    future.add_done_callback(lambda f: _capture_futures.pop(session_id, None) if _capture_futures.get(session_id) is f else None)
+
+def _write_error_log(message, title):
+    """Write one Error Log entry, falling back to stdout if DB logging is unavailable"""
     try:
         frappe.log_error(message, title)
     except Exception:
@@ -250,14 +572,100 @@ def _safe_log(message, title="WhatsApp QR Thread"):
             print(f"[{title}] {message}")
         except Exception:
             pass
+
+def _begin_log_buffer():
+    """Start buffering _safe_log DB writes for the current thread"""
+    _log_buffer.msgs = []
+
+def _flush_log_buffer(title="WhatsApp QR Session"):
+    """Write all buffered messages of the current thread as a single Error Log entry"""
+    msgs = getattr(_log_buffer, "msgs", None)
+    _log_buffer.msgs = None
+    if msgs:
+        _write_error_log("\n".join(msgs), title)
+
+def _flush_pending_logs():
+    """Write the process-wide pending log lines as one Error Log entry per site.
+
+    Runs on the sweeper thread (and at exit), which has no site of its own, so each site's
+    batch is written inside that site's context.
+    """
+    with _pending_logs_lock:
+        entries = list(_pending_logs)
+        _pending_logs.clear()
+    by_site = {}
+    for site, line in entries:
+        by_site.setdefault(site, []).append(line)
+    for site, msgs in by_site.items():
+        entered_site = _enter_site(site)
+        try:
+            _write_error_log("\n".join(msgs), "WhatsApp QR Log Batch")
+        finally:
+            _leave_site(entered_site)
+
+atexit.register(_flush_pending_logs)
+
+def _is_repeated_log(title, message, is_error=False):
+    """True if this exact line was already logged within LOG_REPEAT_WINDOW seconds.
+
+    Lines flagged is_error are never treated as repeats, so every failure
+    reaches the Error Log whatever its title.
+    """
+    if is_error:
+        return False
+    key = (title, message)
+    now = time.monotonic()
+    with _pending_logs_lock:
+        last = _recent_log_lines.get(key)
+        if last is not None and now - last < LOG_REPEAT_WINDOW:
+            return True
+        _recent_log_lines[key] = now
+        if len(_recent_log_lines) > 1000:
+            for stale_key, seen in list(_recent_log_lines.items()):
+                if now - seen >= LOG_REPEAT_WINDOW:
+                    del _recent_log_lines[stale_key]
+    return False
+
+def _safe_log(message, title="WhatsApp QR Thread", is_error=False):
+    """Thread-safe logger that won't fail if DB logging is unavailable.
+
+    While a log buffer is active for this thread, DB writes are deferred to
+    _flush_log_buffer so a whole QR session costs one Error Log insert. Other
+    messages are batched and written by the sweeper thread every
+    LOG_FLUSH_INTERVAL seconds. Callers pass is_error=True for failures; those
+    are written straight away, even inside a buffered session, and wake the
+    sweeper so the batch goes out with them. A non-error line repeated within
+    LOG_REPEAT_WINDOW seconds only goes to the file log.
+    """
+    if is_error:
+        _write_error_log(message, title)
+        _log_flush_now.set()
+    elif not _is_repeated_log(title, message, is_error):
+        msgs = getattr(_log_buffer, "msgs", None)
+        if msgs is not None:
+            msgs.append(f"[{title}] {message}")
+        else:
+            with _pending_logs_lock:
+                _pending_logs.append((getattr(frappe.local, "site", None), f"[{title}] {message}"))
+            _ensure_session_sweeper()
     # Always try to write to file-based log too (best-effort)
     try:
         _append_file_log(title, message)
     except Exception:
         pass
 
+# Chrome binary lookup result, filled on first use (a miss is cached as "")
+_CHROME_BINARY = None
+
 def _resolve_chrome_binary():
-    """Return path to Chrome/Chromium executable if available."""
+    """Return path to Chrome/Chromium executable if available (looked up once per process)."""
+    global _CHROME_BINARY
+    if _CHROME_BINARY is None:
+        _CHROME_BINARY = _find_chrome_binary() or ""
+    return _CHROME_BINARY or None
+
+def _find_chrome_binary():
+    """Search the environment, PATH and well-known install locations for Chrome/Chromium."""
     try:
         env_path = os.environ.get("WHATSAPP_CHROME_BINARY") or os.environ.get("GOOGLE_CHROME_BIN")
         if env_path and os.path.exists(env_path):
@@ -277,170 +685,448 @@ def _resolve_chrome_binary():
             if candidate and os.path.exists(candidate):
                 return candidate
     except Exception as err:
-        _safe_log(f"Chrome binary resolution failed: {err}", "WhatsApp Chrome Resolve")
+        _safe_log(f"Chrome binary resolution failed: {err}", "WhatsApp Chrome Resolve", is_error=True)
     return None
 
-def _build_chrome_options(user_data_dir=None, headless_mode="--headless=new"):
-    """Build Chrome options with all necessary arguments"""
+# chromedriver binary, resolved once by resolve_chromedriver
+_CHROMEDRIVER_PATH = None
+_chromedriver_lock = threading.Lock()
+
+# Cached result of the Chrome launch probe behind health_check_real
+HEALTH_CHECK_TTL = 300
+_health_cache = {'ts': 0, 'result': None}
+
+# Locators and wait conditions, built once and shared by every session
+_QR_LOCATORS = (
+    (By.CSS_SELECTOR, '[data-ref] canvas'),
+    (By.CSS_SELECTOR, 'canvas[aria-label*="QR"]'),
+)
+_QR_ANY_LOCATOR = (By.CSS_SELECTOR, ', '.join(selector for _, selector in _QR_LOCATORS))
+_CHAT_LOCATOR = (By.CSS_SELECTOR, '[data-testid="chat-list"]')
+_LOGGED_IN_LOCATOR = (By.CSS_SELECTOR, "[data-testid='chat-list'], [data-testid='sidebar'], [data-testid='pane-side'], [data-testid='conversation-panel-body']")
+# One selector for "QR shown or already logged in" so the first page-ready wait resolves on either
+_QR_OR_CHAT_PRESENT = EC.presence_of_element_located(
+    (By.CSS_SELECTOR, f"{_CHAT_LOCATOR[1]}, {_QR_ANY_LOCATOR[1]}")
+)
+WAIT_POLL_FREQUENCY = 0.25
+
+# Chrome flags shared by every driver we launch (headless mode and profile dir are added per call)
+BASE_CHROME_ARGS = (
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions",
+    "--disable-plugins",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-breakpad",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-features=TranslateUI",
+    "--disable-ipc-flooding-protection",
+    "--disable-renderer-backgrounding",
+    "--force-color-profile=srgb",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-default-apps",
+    "--disable-component-update",
+    # Keep per-session RSS down: no disk/media cache and a single renderer process
+    "--disk-cache-size=1",
+    "--media-cache-size=1",
+    "--renderer-process-limit=1",
+    # The QR is drawn on a canvas by JS, so image decoding is pure overhead
+    "--blink-settings=imagesEnabled=false",
+    "--window-size=1280,720",
+    "--disable-blink-features=AutomationControlled",
+    # Improve compatibility with WhatsApp Web
+    "--lang=en-US,en",
+    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+)
+
+# Content settings: 2 = block. Nothing in the QR flow needs images, notifications or location.
+CHROME_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+CHROME_EXPERIMENTAL_OPTIONS = {
+    "excludeSwitches": ["enable-automation", "enable-logging"],
+    "useAutomationExtension": False,
+    "prefs": CHROME_PREFS,
+}
+
+# Reduces automation detectability; registered once per driver and run by Chrome on every new document
+_HARDEN_JS = (
+    "Object.defineProperty(navigator,'webdriver',{get:()=>undefined});"
+    "window.chrome={runtime:{}};"
+    "const originalQuery=window.navigator.permissions.query;"
+    "window.navigator.permissions.query=(p)=>(p.name==='notifications'?"
+    "Promise.resolve({state:Notification.permission}):originalQuery(p));"
+    "Object.defineProperty(navigator,'platform',{get:()=>'Win32'});"
+    "Object.defineProperty(navigator,'language',{get:()=>'en-US'});"
+    "Object.defineProperty(navigator,'languages',{get:()=>['en-US','en']});"
+)
+
+# Requests WhatsApp Web makes that nothing here needs (animations, web fonts, trackers, avatars)
+BLOCKED_URL_PATTERNS = [
+    "*.gif",
+    "*.woff",
+    "*.woff2",
+    "https://graph.facebook.com/*",
+    "https://pps.whatsapp.net/*",
+]
+
+def resolve_chromedriver():
+    """Return the chromedriver path, resolving it only once per process.
+
+    ChromeDriverManager().install() probes the network and scans its cache on every call,
+    so an explicit CHROMEDRIVER_PATH wins and the manager result is memoized.
+    """
+    global _CHROMEDRIVER_PATH
+    # Double-checked: once resolved, launches read the path without taking the lock
+    if _CHROMEDRIVER_PATH is not None:
+        return _CHROMEDRIVER_PATH
+    with _chromedriver_lock:
+        if _CHROMEDRIVER_PATH is None:
+            env_path = os.environ.get("CHROMEDRIVER_PATH")
+            if env_path and os.path.exists(env_path):
+                _CHROMEDRIVER_PATH = env_path
+            else:
+                _CHROMEDRIVER_PATH = ChromeDriverManager().install()
+            _safe_log(f"ChromeDriver path: {_CHROMEDRIVER_PATH}", "WhatsApp ChromeDriver")
+        return _CHROMEDRIVER_PATH
+
+def _build_chrome_options(user_data_dir=None, headless_mode="--headless=new", remote=False):
+    """Build Chrome options from the shared argument template (remote: for a grid node, no local binary)"""
     chrome_options = Options()
+    # driver.get() returns at DOMContentLoaded; callers wait for the elements they need
+    chrome_options.page_load_strategy = 'eager'
     if headless_mode:
         chrome_options.add_argument(headless_mode)  # Use requested headless mode
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-software-rasterizer")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-plugins")
-    chrome_options.add_argument("--disable-background-networking")
-    chrome_options.add_argument("--disable-background-timer-throttling")
-    chrome_options.add_argument("--disable-backgrounding-occluded-windows")
-    chrome_options.add_argument("--disable-breakpad")
-    chrome_options.add_argument("--disable-component-extensions-with-background-pages")
-    chrome_options.add_argument("--disable-features=TranslateUI")
-    chrome_options.add_argument("--disable-ipc-flooding-protection")
-    chrome_options.add_argument("--disable-renderer-backgrounding")
-    chrome_options.add_argument("--force-color-profile=srgb")
-    chrome_options.add_argument("--metrics-recording-only")
-    chrome_options.add_argument("--mute-audio")
-    chrome_options.add_argument("--window-size=1280,720")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-    # Improve compatibility with WhatsApp Web
-    chrome_options.add_argument("--lang=en-US,en")
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
+    for arg in BASE_CHROME_ARGS:
+        chrome_options.add_argument(arg)
+    for name, value in CHROME_EXPERIMENTAL_OPTIONS.items():
+        chrome_options.add_experimental_option(name, value)
+
     # Add user data dir if provided
     if user_data_dir:
         chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
-    
+
+    if remote:
+        return chrome_options
+
     binary_path = _resolve_chrome_binary()
     if binary_path:
         chrome_options.binary_location = binary_path
     else:
         _safe_log("Chrome binary not explicitly resolved; relying on system defaults", "WhatsApp Chrome Resolve")
-    
+
     return chrome_options
 
+def _get_grid_url():
+    """Selenium Grid/Selenoid endpoint from WHATSAPP_GRID_URL or the site config key whatsapp_grid_url"""
+    url = os.environ.get("WHATSAPP_GRID_URL")
+    if not url:
+        try:
+            url = frappe.conf.get("whatsapp_grid_url")
+        except Exception:
+            url = None
+    return url or None
+
+def _is_driver_version_error(err):
+    """True if Chrome refused to start because chromedriver doesn't match its version"""
+    text = str(err).lower()
+    return "only supports chrome version" in text or "this version of chromedriver" in text
+
+def _new_driver(user_data_dir=None, headless_mode="--headless=new"):
+    """Launch a fresh Chrome driver; profile-less drivers are marked as poolable.
+
+    With a grid URL configured, profile-less drivers are Remote sessions on the grid instead.
+    """
+    global _CHROMEDRIVER_PATH
+    grid_url = _get_grid_url()
+    if grid_url and not user_data_dir:
+        # The grid keeps its own warm browsers; profile-dir sessions stay local since the path is ours
+        chrome_options = _build_chrome_options(headless_mode=headless_mode, remote=True)
+        driver = webdriver.Remote(command_executor=grid_url, options=chrome_options)
+        driver._wa_poolable = False
+        return driver
+    chrome_options = _build_chrome_options(user_data_dir=user_data_dir, headless_mode=headless_mode)
+    driver_path = resolve_chromedriver()
+    try:
+        driver = webdriver.Chrome(service=ChromeService(executable_path=driver_path), options=chrome_options)
+    except Exception as launch_err:
+        if not _is_driver_version_error(launch_err) or driver_path == os.environ.get("CHROMEDRIVER_PATH"):
+            raise
+        # Chrome was upgraded under us: forget the cached chromedriver and fetch a matching one
+        _safe_log(f"Cached chromedriver no longer matches Chrome, re-resolving: {launch_err}", "WhatsApp ChromeDriver")
+        with _chromedriver_lock:
+            if _CHROMEDRIVER_PATH == driver_path:
+                _CHROMEDRIVER_PATH = None
+        driver = webdriver.Chrome(service=ChromeService(executable_path=resolve_chromedriver()), options=chrome_options)
+    driver._wa_poolable = not user_data_dir
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as block_err:
+        _safe_log(f"Could not set blocked URLs: {str(block_err)}", "WhatsApp Chrome Options", is_error=True)
+    # New-document scripts stay registered for the driver's lifetime, so pooled drivers never re-add them
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _HARDEN_JS})
+        _install_connection_observer(driver)
+    except Exception as harden_err:
+        _safe_log(f"Hardening script injection failed: {str(harden_err)}", "WhatsApp Chrome Hardening", is_error=True)
+    return driver
+
+def _quit_driver(driver):
+    """Quit a driver, swallowing errors"""
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def _checkout_driver():
+    """Return a warm profile-less driver from the pool, or None on a miss.
+
+    Prefers the driver this thread released last, then the most recently pooled one.
+    """
+    with _driver_pool_lock:
+        preferred = getattr(_thread_driver, "last", None)
+        if preferred is not None and preferred in _driver_pool:
+            _driver_pool.remove(preferred)
+            candidate = preferred
+        elif _driver_pool:
+            candidate = _driver_pool.pop()
+        else:
+            candidate = None
+    while candidate is not None:
+        try:
+            candidate.current_url  # liveness probe
+            return candidate
+        except Exception:
+            _quit_driver(candidate)
+        with _driver_pool_lock:
+            candidate = _driver_pool.pop() if _driver_pool else None
+    return None
+
+def _release_driver(driver):
+    """Return a driver to the warm pool if possible, otherwise quit it"""
+    if driver is None:
+        return
+    if not getattr(driver, "_wa_poolable", False):
+        _quit_driver(driver)
+        return
+    driver._wa_uses = getattr(driver, "_wa_uses", 0) + 1
+    if driver._wa_uses >= DRIVER_MAX_USES:
+        # Worn out: replace it with a fresh process instead of pooling it again
+        _quit_driver(driver)
+        _prewarm_driver_pool()
+        return
+    try:
+        # Wipe the WhatsApp login (cookies + IndexedDB/localStorage) but keep the process warm
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+            "origin": WHATSAPP_WEB_ORIGIN,
+            "storageTypes": "all",
+        })
+        driver.get("about:blank")
+    except Exception:
+        _quit_driver(driver)
+        return
+    with _driver_pool_lock:
+        if len(_driver_pool) < DRIVER_POOL_SIZE:
+            _driver_pool.append(driver)
+            _thread_driver.last = driver
+            return
+    _quit_driver(driver)
+
+def _prewarm_driver_pool():
+    """Fill the driver pool up to DRIVER_POOL_SIZE in the background (not needed behind a grid)"""
+    if _get_grid_url():
+        return
+    def fill():
+        while True:
+            with _driver_pool_lock:
+                if len(_driver_pool) >= DRIVER_POOL_SIZE:
+                    return
+            try:
+                driver = _new_driver()
+            except Exception as err:
+                _safe_log(f"Driver pool warm-up failed: {err}", "WhatsApp Chrome Pool", is_error=True)
+                return
+            with _driver_pool_lock:
+                if len(_driver_pool) < DRIVER_POOL_SIZE:
+                    _driver_pool.append(driver)
+                    continue
+            _quit_driver(driver)
+            return
+    threading.Thread(target=fill, daemon=True).start()
+
+def _drain_pool():
+    """Quit every pooled driver (registered with atexit)"""
+    with _driver_pool_lock:
+        drivers = list(_driver_pool)
+        _driver_pool.clear()
+    for driver in drivers:
+        _quit_driver(driver)
+
+atexit.register(_drain_pool)
+
+# Chrome profile lock files, found in the profile root and in its Default subdirectory
+PROFILE_LOCK_NAMES = frozenset({"SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "LOCKFILE"})
+
+def _clean_profile_locks(session_dir):
+    """Remove stale Chrome lock files from a profile; return True if one is still held.
+
+    Uses one scandir per directory instead of an exists() probe per candidate name. That also
+    catches SingletonLock, which on Linux is a dangling symlink that os.path.exists() misses.
+    """
+    held = False
+    for root in (session_dir, os.path.join(session_dir, "Default")):
+        try:
+            entries = [entry.path for entry in os.scandir(root) if entry.name in PROFILE_LOCK_NAMES]
+        except OSError:
+            continue
+        for lock_path in entries:
+            for attempt in range(2):
+                try:
+                    os.remove(lock_path)
+                    _safe_log(f"Removed lock file: {lock_path}", "WhatsApp Session Cleanup")
+                    break
+                except PermissionError:
+                    # On Windows the file may still be closing; retry once after a short delay
+                    if attempt == 0 and platform.system() == 'Windows':
+                        time.sleep(0.1)
+                        continue
+                    _safe_log(f"Lock file is in use, will skip persistent session: {lock_path}", "WhatsApp Session Cleanup")
+                    held = True
+                    break
+                except Exception as lock_err:
+                    _safe_log(f"Could not remove lock file {lock_path}: {str(lock_err)}", "WhatsApp Session Cleanup", is_error=True)
+                    break
+    return held
+
+def _enter_site(site_name):
+    """Bind the current (worker) thread to site_name; return True if a context was created here.
+
+    A context left behind for another site is destroyed first, since frappe.init is a no-op on an
+    already initialised thread. Pair every True result with _leave_site.
+    """
+    current = getattr(frappe.local, "site", None)
+    if not site_name or current == site_name:
+        return False
+    initialised = False
+    try:
+        if current:
+            frappe.destroy()
+        frappe.init(site=site_name)
+        initialised = True
+        frappe.connect()
+    except Exception as ctx_error:
+        _safe_log(f"Thread site init failed: {str(ctx_error)}", "WhatsApp QR Thread Init", is_error=True)
+    return initialised
+
+def _leave_site(entered):
+    """Commit and tear down a context created by _enter_site, so no connection outlives the task"""
+    if not entered:
+        return
+    try:
+        if getattr(frappe.local, "db", None):
+            frappe.db.commit()
+    except Exception:
+        pass
+    try:
+        frappe.destroy()
+    except Exception:
+        pass
+
 def capture_whatsapp_qr(session_id, site_name=None, session_dir=None):
     """Capture real WhatsApp Web QR code"""
     driver = None
+    # Pooled executor threads are reused across captures (and sites), so bind this capture's site
+    # explicitly and tear the context down again in finally
+    entered_site = _enter_site(site_name)
+    _begin_log_buffer()
     try:
         _safe_log(f"Starting QR capture for session: {session_id}", "WhatsApp QR Capture Start")
 
-        # Ensure frappe site context if available (for logging)
-        if site_name:
-            try:
-                if not getattr(frappe.local, "site", None):
-                    frappe.init(site=site_name)
-                    frappe.connect(site=site_name)
-            except Exception as ctx_error:
-                _safe_log(f"Thread site init failed: {str(ctx_error)}", "WhatsApp QR Thread Init")
-        
         # Set up session directory with error handling and cleanup
         use_persistent_session = False
         effective_session_dir = None
         skip_persistent_due_to_lock = False
-        
+
         if session_dir:
             try:
-                # Ensure directory exists first
-                os.makedirs(session_dir, exist_ok=True)
-                
-                # Clean up Chrome lock files (from previous crashed sessions)
-                # Chrome creates lock files in multiple locations
-                lock_files_to_check = [
-                    os.path.join(session_dir, "SingletonLock"),
-                    os.path.join(session_dir, "SingletonSocket"),
-                    os.path.join(session_dir, "SingletonCookie"),
-                ]
-                
-                # Also check in Default profile subdirectory (common on Windows)
-                default_profile = os.path.join(session_dir, "Default")
-                if os.path.exists(default_profile):
-                    lock_files_to_check.extend([
-                        os.path.join(default_profile, "SingletonLock"),
-                        os.path.join(default_profile, "lockfile"),
-                        os.path.join(default_profile, "LOCKFILE"),
-                    ])
-                
-                # Clean up any existing lock files
-                for lock_path in lock_files_to_check:
-                    if os.path.exists(lock_path):
-                        try:
-                            # On Windows, files might be locked; try to remove with a small delay
-                            if platform.system() == 'Windows':
-                                time.sleep(0.1)
-                            os.remove(lock_path)
-                            _safe_log(f"Removed lock file: {lock_path}", "WhatsApp Session Cleanup")
-                        except PermissionError:
-                            # File is locked by another process - skip persistent session
-                            _safe_log(f"Lock file is in use, will skip persistent session: {lock_path}", "WhatsApp Session Cleanup")
-                            skip_persistent_due_to_lock = True
-                            break
-                        except Exception as lock_err:
-                            _safe_log(f"Could not remove lock file {lock_path}: {str(lock_err)}", "WhatsApp Session Cleanup")
-                            # Continue - might still work
-                
+                # Ensure directory exists first (normally already created by get_session_directory)
+                if not os.path.isdir(session_dir):
+                    os.makedirs(session_dir, exist_ok=True)
+
+                # Clean up Chrome lock files (from previous crashed sessions); a lock that
+                # can't be removed is held by a live Chrome, so skip the persistent session
+                skip_persistent_due_to_lock = _clean_profile_locks(session_dir)
+
                 # Only proceed if we didn't hit a permission error and directory is writable
                 if not skip_persistent_due_to_lock:
-                    # Test if directory is writable
-                    test_file = os.path.join(session_dir, ".test_write")
-                    try:
-                        with open(test_file, 'w') as f:
-                            f.write("test")
-                        os.remove(test_file)
+                    # Test if directory is writable (a permission check, no probe file to leave behind)
+                    if os.access(session_dir, os.W_OK | os.X_OK):
                         effective_session_dir = session_dir
                         use_persistent_session = True
                         _safe_log(f"Session directory configured: {session_dir}", "WhatsApp Session Dir")
-                    except Exception as write_err:
-                        _safe_log(f"Session directory not writable: {str(write_err)}", "WhatsApp Session Dir Error")
+                    else:
+                        _safe_log(f"Session directory not writable: {session_dir}", "WhatsApp Session Dir Error", is_error=True)
                         effective_session_dir = None
                         use_persistent_session = False
-                    
+
             except Exception as dir_error:
-                _safe_log(f"Session directory error: {str(dir_error)}", "WhatsApp Session Dir Error")
+                _safe_log(f"Session directory error: {str(dir_error)}", "WhatsApp Session Dir Error", is_error=True)
                 effective_session_dir = None
                 use_persistent_session = False
-        
+
         if not use_persistent_session:
             _safe_log("Running without persistent session directory", "WhatsApp Session Dir")
-        
+
         # Create driver with enhanced error handling and retry logic
         headless_modes = HEADLESS_FALLBACK_MODES
         max_retries = max(3, len(headless_modes))
         driver = None
         last_error = None
-        
+
         for attempt in range(max_retries):
             try:
                 # Build chrome options (with or without user-data-dir based on retry)
                 # Use persistent session only on first attempt if it's enabled
                 current_session_dir = effective_session_dir if (attempt == 0 and use_persistent_session) else None
                 headless_arg = headless_modes[min(attempt, len(headless_modes) - 1)] if headless_modes else "--headless=new"
-                chrome_options = _build_chrome_options(user_data_dir=current_session_dir, headless_mode=headless_arg)
                 if attempt > 0:
                     _safe_log(f"Retrying Chrome launch with headless mode '{headless_arg}' (attempt {attempt + 1})", "WhatsApp Chrome Retry")
-                
-                # Install ChromeDriver
-                chromedriver_path = ChromeDriverManager().install()
-                _safe_log(f"ChromeDriver path: {chromedriver_path} (attempt {attempt + 1})", "WhatsApp ChromeDriver")
-                
-                # Create service
-                service = ChromeService(chromedriver_path)
-                
+
+                # Profile-less sessions can reuse a warm pooled driver
+                if not current_session_dir:
+                    driver = _checkout_driver()
+                    if driver:
+                        _safe_log(f"Reusing pooled Chrome driver (attempt {attempt + 1})", "WhatsApp Chrome Pool")
+
                 # Try to create driver
-                driver = webdriver.Chrome(service=service, options=chrome_options)
+                if driver is None:
+                    driver = _new_driver(user_data_dir=current_session_dir, headless_mode=headless_arg)
                 driver.set_page_load_timeout(20)
-                driver.implicitly_wait(5)
+                driver.implicitly_wait(0)  # explicit WebDriverWaits only; an implicit wait stalls every empty find_elements
                 _safe_log(f"Chrome driver created successfully (attempt {attempt + 1})", "WhatsApp Chrome Success")
                 break
-                
+
             except Exception as driver_error:
+                _quit_driver(driver)
+                driver = None
                 error_str = str(driver_error)
                 last_error = error_str
-                _safe_log(f"Chrome driver creation failed (attempt {attempt + 1}): {error_str}", "WhatsApp Chrome Error")
-                
+                _safe_log(f"Chrome driver creation failed (attempt {attempt + 1}): {error_str}", "WhatsApp Chrome Error", is_error=True)
+
                 # If it's a session directory issue and we're using one, retry without it
                 if attempt == 0 and use_persistent_session:
                     error_lower = error_str.lower()
@@ -449,388 +1135,539 @@ def capture_whatsapp_qr(session_id, site_name=None, session_dir=None):
                         use_persistent_session = False
                         effective_session_dir = None
                         continue
-                
+
                 # If this is the last attempt, we'll raise the error below
                 if attempt < max_retries - 1:
                     time.sleep(1)  # Wait before retry
-        
+
         if driver is None:
             raise Exception(f"Failed to start Chrome after {max_retries} attempts: {last_error or 'Unknown error'}")
-        
-        # Reduce automation detectability
-        try:
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": """
-                    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-                    window.chrome = { runtime: {} };
-                    const originalQuery = window.navigator.permissions.query;
-                    window.navigator.permissions.query = (parameters) => (
-                      parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                    );
-                    Object.defineProperty(navigator, 'platform', { get: () => 'Win32' });
-                    Object.defineProperty(navigator, 'language', { get: () => 'en-US' });
-                    Object.defineProperty(navigator, 'languages', { get: () => ['en-US', 'en'] });
-                """
-            })
-        except Exception as harden_err:
-            _safe_log(f"Hardening script injection failed: {str(harden_err)}", "WhatsApp Chrome Hardening")
-        
+
         # Navigate to WhatsApp Web
         try:
-            driver.get("https://web.whatsapp.com")
-            _safe_log(f"Navigated to WhatsApp Web", "WhatsApp Navigation")
+            driver.get(WHATSAPP_WEB_ORIGIN)
+            _safe_log("Navigated to WhatsApp Web", "WhatsApp Navigation")
         except Exception as nav_error:
-            _safe_log(f"Navigation failed: {str(nav_error)}", "WhatsApp Navigation Error")
+            _safe_log(f"Navigation failed: {str(nav_error)}", "WhatsApp Navigation Error", is_error=True)
             raise Exception(f"Failed to load WhatsApp Web: {str(nav_error)}")
-        
-        # Wait for page to load
-        time.sleep(3)
-        
-        # Check if already connected
+
+        # Wait until either the QR canvas or the chat list is rendered instead of a fixed sleep;
+        # a single wait shares one budget across the chat and QR selectors.
+        wait = WebDriverWait(driver, 18, poll_frequency=WAIT_POLL_FREQUENCY)
         try:
-            chat_list = driver.find_element(By.CSS_SELECTOR, '[data-testid="chat-list"]')
-            if chat_list:
-                active_qr_sessions[session_id] = {
-                    'status': 'connected',
-                    'message': 'Already connected to WhatsApp'
-                }
-                _safe_log(f"Already connected", "WhatsApp Already Connected")
-                return
-        except:
-            pass  # Not connected, continue to QR
-        
-        # Wait for QR code with multiple selectors
-        qr_selectors = [
-            '[data-ref] canvas',
-            'canvas[aria-label*="QR"]',
-            'div[data-ref] canvas',
-            'canvas'
-        ]
-        
-        qr_element = None
-        wait = WebDriverWait(driver, 10)
-        
-        for selector in qr_selectors:
-            try:
-                qr_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-                if qr_element:
-                    # Verify it's actually a QR code by checking size
-                    size = qr_element.size
-                    if size['width'] > 200 and size['height'] > 200:
-                        _safe_log(f"QR element found with selector: {selector}", "WhatsApp QR Found")
-                        break
-            except Exception as selector_error:
-                _safe_log(f"Selector {selector} failed: {str(selector_error)}", "WhatsApp QR Selector")
-                continue
-        
-        if not qr_element:
+            qr_element = wait.until(_QR_OR_CHAT_PRESENT)
+        except TimeoutException:
             raise Exception("QR code element not found with any selector")
-        
+
+        # Check if already connected
+        if qr_element.tag_name.lower() != 'canvas':
+            connected_dir = effective_session_dir if use_persistent_session else None
+            # Keep the logged-in driver for sending instead of leaking it
+            active_drivers[session_id] = driver
+            active_qr_sessions.set(session_id, {
+                'status': 'connected',
+                'connected_at': time.time(),
+                'message': 'Already connected to WhatsApp',
+                'session_dir': connected_dir,
+                'driver_active': True
+            })
+            _safe_log("Already connected", "WhatsApp Already Connected")
+            _keep_session_alive(driver, session_id, connected_dir)
+            return
+
+        size = qr_element.size
+        if size['width'] <= 200 or size['height'] <= 200:
+            # Present but not laid out yet (or not the QR at all): give it a moment to reach its
+            # real size, otherwise fail so the error/cleanup path runs instead of storing a bad QR
+            _safe_log(f"QR element smaller than expected: {size}", "WhatsApp QR Selector")
+            try:
+                qr_element = WebDriverWait(driver, 5, poll_frequency=WAIT_POLL_FREQUENCY).until(_sized_qr_element)
+            except TimeoutException:
+                raise Exception(f"QR code element too small to scan: {size['width']}x{size['height']}px")
+
+        # Remember which QR this is (read before the export, so a rotation in between only costs
+        # one extra export later) so status polls can skip re-exporting it
+        try:
+            qr_ref = driver.execute_script(_QR_REF_JS)
+        except Exception:
+            qr_ref = None
+
         # Extract QR code directly from canvas with better accuracy
         qr_data_url = _extract_qr_from_canvas(driver, qr_element)
-        
+
         # Store driver reference to keep it alive
         active_drivers[session_id] = driver
-        
+
         # Update session status
-        active_qr_sessions[session_id] = {
+        active_qr_sessions.set(session_id, {
             'status': 'qr_ready',
             'qr_data': qr_data_url,
+            'qr_ref': qr_ref,
+            'qr_hash': _get_qr_hash(qr_data_url),
             'generated_at': time.time(),
             'driver_active': True,
             'session_dir': effective_session_dir if use_persistent_session else None
-        }
-        
+        })
+
         _safe_log(f"QR capture successful for session: {session_id}", "WhatsApp QR Success")
-        
+
         # Keep driver alive and monitor for QR changes and connection
-        # Run monitor in a separate thread so it doesn't block
-        monitor_thread = threading.Thread(target=monitor_qr_scan, args=(driver, session_id, effective_session_dir))
-        monitor_thread.daemon = True
-        monitor_thread.start()
-        
+        # Run monitor on the monitor pool so it doesn't block
+        _start_monitor(driver, session_id, effective_session_dir)
+
     except Exception as e:
         error_msg = str(e)
-        _safe_log(f"QR Capture Error for {session_id}: {error_msg}", "WhatsApp QR Capture")
-        active_qr_sessions[session_id] = {
+        _safe_log(f"QR Capture Error for {session_id}: {error_msg}", "WhatsApp QR Capture", is_error=True)
+        active_qr_sessions.set(session_id, {
             'status': 'error',
             'error': error_msg
-        }
+        })
         # Clean up driver on error
         if session_id in active_drivers:
-            try:
-                active_drivers[session_id].quit()
-            except:
-                pass
-            del active_drivers[session_id]
+            _release_driver(active_drivers.pop(session_id))
         elif driver:
-            try:
-                driver.quit()
-            except:
-                pass
+            _release_driver(driver)
+        # A throwaway temp profile (get_session_directory fallback) is never reused; don't leak it
+        if session_dir and _is_temp_session_dir(session_id, session_dir):
+            _purge_session_dir(session_dir)
+    finally:
+        _flush_log_buffer("WhatsApp QR Capture")
+        _leave_site(entered_site)
+
+def _is_temp_session_dir(session_id, path):
+    """True for a mkdtemp fallback profile created by get_session_directory"""
+    import tempfile
+    return (
+        os.path.dirname(os.path.abspath(path)) == os.path.abspath(tempfile.gettempdir())
+        and os.path.basename(path).startswith(f"whatsapp_{session_id}_")
+    )
+
+def _purge_session_dir(path):
+    """Remove a profile directory in one rmtree pass, ignoring errors"""
+    shutil.rmtree(path, ignore_errors=True)
+
+# Finds the QR canvas and returns it as a lossless WebP data URL (null when absent or tainted).
+# An expression rather than a function body so it can go straight to Runtime.evaluate
+_QR_CANVAS_JS = """
+    (function() {
+        // One DOM walk for every known QR canvas selector
+        let canvas = document.querySelector('canvas[data-ref], [data-ref] canvas, canvas[aria-label*="QR"]');
+        if (!canvas) {
+            // Last resort: find any canvas that might be QR
+            const canvases = document.querySelectorAll('canvas');
+            for (let c of canvases) {
+                const rect = c.getBoundingClientRect();
+                // QR codes are typically square and between 200-400px
+                if (rect.width >= 200 && rect.height >= 200 &&
+                    Math.abs(rect.width - rect.height) < 50) {
+                    canvas = c;
+                    break;
+                }
+            }
+        }
+
+        if (!canvas) return null;
+
+        try {
+            // Lossless WebP (quality 1): same pixels as PNG, a fraction of the bytes and encode time.
+            // Browsers without a WebP encoder hand back PNG instead
+            return canvas.toDataURL('image/webp', 1);
+        } catch (e) {
+            console.error('Canvas toDataURL error:', e);
+            return null;
+        }
+    })();
+"""
+
+def _evaluate_js(driver, expression):
+    """Evaluate a JS expression and return its value, over CDP when the driver speaks it.
+
+    Runtime.evaluate skips WebDriver's script wrapping and argument marshalling;
+    Remote (grid) drivers have no CDP channel and go through execute_script.
+    """
+    if hasattr(driver, "execute_cdp_cmd"):
+        res = driver.execute_cdp_cmd("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": False,
+        })
+        return res.get('result', {}).get('value')
+    # strip(): a line break right after "return" would make ASI end the statement there (return;)
+    return driver.execute_script("return " + expression.strip())
+
+def _screenshot_crop_qr(driver, qr_element):
+    """Capture just the QR element as a PNG data URL (CDP clip first, Pillow crop as last resort)"""
+    try:
+        rect = qr_element.rect  # one round-trip instead of .location + .size
+        padding = 4  # Just enough quiet zone; every extra pixel is encoded for nothing
+        left = max(0, rect['x'] - padding)
+        top = max(0, rect['y'] - padding)
+        width = rect['width'] + (padding * 2)
+        height = rect['height'] + (padding * 2)
+
+        # Let Chrome render and encode only the QR rectangle; CDP already returns base64
+        try:
+            shot = driver.execute_cdp_cmd("Page.captureScreenshot", {
+                "format": "png",
+                "clip": {"x": left, "y": top, "width": width, "height": height, "scale": 1},
+                "captureBeyondViewport": False,
+            })
+            if shot and shot.get('data'):
+                return f"data:image/png;base64,{shot['data']}"
+        except Exception as cdp_err:
+            _safe_log(f"CDP clip screenshot failed: {str(cdp_err)}", "WhatsApp QR Extract")
+
+        # Last resort only: Pillow is imported lazily so the canvas path never pays for it
+        import io
+
+        from PIL import Image
+
+        screenshot = driver.get_screenshot_as_png()
+        with Image.open(io.BytesIO(screenshot)) as image, io.BytesIO() as buffer:
+            qr_image = image.crop((left, top, left + width, top + height))
+            # PNG is lossless (quality= is ignored); favour encode speed over size
+            qr_image.save(buffer, format='PNG', compress_level=1, optimize=False)
+            img_str = _b64encode(buffer.getbuffer()).decode('ascii')
+        return f"data:image/png;base64,{img_str}"
+    except Exception as screenshot_err:
+        _safe_log(f"Screenshot fallback failed: {str(screenshot_err)}", "WhatsApp QR Extract", is_error=True)
+        return None
 
 def _extract_qr_from_canvas(driver, qr_element=None):
     """Extract QR code directly from canvas with highest accuracy"""
     try:
         # Try to get QR from canvas using the most accurate method
-        qr_data_url = driver.execute_script("""
-            (function() {
-                // First, try to find the exact QR canvas with data-ref attribute
-                let canvas = document.querySelector('canvas[data-ref]');
-                
-                // If not found, try other selectors
-                if (!canvas) {
-                    canvas = document.querySelector('div[data-ref] canvas');
-                }
-                if (!canvas) {
-                    canvas = document.querySelector('canvas[aria-label*="QR"]');
-                }
-                if (!canvas) {
-                    // Last resort: find any canvas that might be QR
-                    const canvases = document.querySelectorAll('canvas');
-                    for (let c of canvases) {
-                        const rect = c.getBoundingClientRect();
-                        // QR codes are typically square and between 200-400px
-                        if (rect.width >= 200 && rect.height >= 200 && 
-                            Math.abs(rect.width - rect.height) < 50) {
-                            canvas = c;
-                            break;
-                        }
-                    }
-                }
-                
-                if (!canvas) return null;
-                
-                try {
-                    // Get canvas data as PNG with highest quality
-                    return canvas.toDataURL('image/png');
-                } catch (e) {
-                    console.error('Canvas toDataURL error:', e);
-                    return null;
-                }
-            })();
-        """)
-        
-        if qr_data_url and isinstance(qr_data_url, str) and qr_data_url.startswith("data:image"):
+        qr_data_url = _evaluate_js(driver, _QR_CANVAS_JS)
+
+        # Our own JS returns a string or null, so no type check is needed
+        if qr_data_url and qr_data_url[:10] == "data:image":
             return qr_data_url
-        
+
         # Fallback: screenshot method if canvas extraction fails
         if qr_element:
-            try:
-                location = qr_element.location
-                size = qr_element.size
-                padding = 10  # Less padding for more accuracy
-                left = max(0, location['x'] - padding)
-                top = max(0, location['y'] - padding)
-                width = size['width'] + (padding * 2)
-                height = size['height'] + (padding * 2)
-
-                screenshot = driver.get_screenshot_as_png()
-                image = Image.open(io.BytesIO(screenshot))
-                qr_image = image.crop((left, top, left + width, top + height)).convert('RGB')
-                buffer = io.BytesIO()
-                qr_image.save(buffer, format='PNG', quality=100)  # Maximum quality
-                img_str = base64.b64encode(buffer.getvalue()).decode()
-                return f"data:image/png;base64,{img_str}"
-            except Exception as screenshot_err:
-                _safe_log(f"Screenshot fallback failed: {str(screenshot_err)}", "WhatsApp QR Extract")
-        
+            return _screenshot_crop_qr(driver, qr_element)
+
         return None
     except Exception as e:
-        _safe_log(f"QR extraction error: {str(e)}", "WhatsApp QR Extract")
+        _safe_log(f"QR extraction error: {str(e)}", "WhatsApp QR Extract", is_error=True)
         return None
 
+# First QR canvas larger than 200x200 as a lossless WebP data URL (null when none or tainted),
+# sized and exported in the page instead of proxying every candidate element back to Python
+_SIZED_QR_JS = f"""
+    (function() {{
+        for (const c of document.querySelectorAll('{_QR_ANY_LOCATOR[1]}')) {{
+            const rect = c.getBoundingClientRect();
+            if (rect.width > 200 && rect.height > 200) {{
+                try {{ return c.toDataURL('image/webp', 1); }} catch (e) {{ return null; }}
+            }}
+        }}
+        return null;
+    }})()
+"""
+
+def _is_logged_in(driver):
+    """True when any logged-in marker is on the page (one round-trip, no element proxies)"""
+    return bool(driver.execute_script("return !!document.querySelector(arguments[0]);", _LOGGED_IN_LOCATOR[1]))
+
+def _sized_qr_element(driver):
+    """WebDriverWait condition: the first QR canvas larger than 200x200, else False"""
+    for el in driver.find_elements(*_QR_ANY_LOCATOR):
+        size = el.size
+        if size.get('width', 0) > 200 and size.get('height', 0) > 200:
+            return el
+    return False
+
+def _read_visible_qr(driver):
+    """Return (qr_present, data_url) for the QR currently on the page, without waiting for it"""
+    qr_elements = driver.find_elements(*_QR_ANY_LOCATOR)
+    if not qr_elements:
+        return False, None
+    return True, _extract_qr_from_canvas(driver, qr_elements[0])
+
 def _keep_session_alive(driver, session_id, session_dir=None):
-    """Keep WhatsApp session alive after connection"""
-    try:
-        _safe_log(f"Starting session keep-alive for: {session_id}", "WhatsApp Keep-Alive")
-        
-        # Keep checking connection status periodically
-        check_interval = 30  # Check every 30 seconds
-        last_check = time.time()
-        
-        while session_id in active_drivers and session_id in active_qr_sessions:
+    """Register a connected session with the shared keep-alive loop (idempotent)"""
+    global _keep_alive_thread
+    with _keep_alive_lock:
+        entry = _keep_alive_sessions.get(session_id)
+        if entry is None or entry[0] is not driver:
+            _safe_log(f"Starting session keep-alive for: {session_id}", "WhatsApp Keep-Alive")
+            _keep_alive_sessions[session_id] = [driver, session_dir, time.time()]
+        if _keep_alive_thread is None or not _keep_alive_thread.is_alive():
+            _keep_alive_thread = threading.Thread(target=_keep_alive_loop, daemon=True)
+            _keep_alive_thread.start()
+
+def _keep_alive_loop():
+    """One thread checks every connected session every KEEP_ALIVE_INTERVAL seconds"""
+    while True:
+        time.sleep(10)
+        with _keep_alive_lock:
+            entries = list(_keep_alive_sessions.items())
+        for session_id, entry in entries:
+            driver, session_dir, last_check = entry
+            if active_drivers.get(session_id) is not driver or session_id not in active_qr_sessions:
+                _end_keep_alive(session_id, driver)
+                continue
+            current_time = time.time()
+            if current_time - last_check < KEEP_ALIVE_INTERVAL:
+                continue
+            entry[2] = current_time
             try:
-                current_time = time.time()
-                
-                # Check connection status periodically
-                if current_time - last_check >= check_interval:
-                    last_check = current_time
-                    try:
-                        # Verify still connected
-                        chat_list = driver.find_elements(By.CSS_SELECTOR, '[data-testid="chat-list"]')
-                        if not chat_list:
-                            # Connection lost
-                            _safe_log(f"Connection lost for session: {session_id}", "WhatsApp Keep-Alive")
-                            active_qr_sessions[session_id] = {
-                                'status': 'disconnected',
-                                'message': 'WhatsApp connection lost',
-                                'session_dir': session_dir
-                            }
-                            break
-                        else:
-                            # Still connected, update last check time
-                            if active_qr_sessions[session_id].get('status') == 'connected':
-                                # Update connection time
-                                active_qr_sessions[session_id]['last_check'] = current_time
-                    except Exception as check_err:
-                        # Error checking connection - might be disconnected
-                        _safe_log(f"Error checking connection: {str(check_err)}", "WhatsApp Keep-Alive")
-                        # Don't break immediately - might be temporary
-                
-                # Sleep to avoid excessive CPU usage
-                time.sleep(10)
-                
-            except Exception as e:
-                _safe_log(f"Error in keep-alive loop: {str(e)}", "WhatsApp Keep-Alive")
-                time.sleep(10)
-        
-        _safe_log(f"Keep-alive thread ended for session: {session_id}", "WhatsApp Keep-Alive")
-        
-    except Exception as e:
-        _safe_log(f"Keep-alive error for session {session_id}: {str(e)}", "WhatsApp Keep-Alive")
+                # Verify still connected (any logged-in marker, one compound-selector round-trip)
+                if not _is_logged_in(driver):
+                    # Connection lost
+                    _safe_log(f"Connection lost for session: {session_id}", "WhatsApp Keep-Alive")
+                    active_qr_sessions.set(session_id, {
+                        'status': 'disconnected',
+                        'message': 'WhatsApp connection lost',
+                        'session_dir': session_dir
+                    })
+                    _end_keep_alive(session_id, driver)
+                elif (active_qr_sessions.get(session_id) or {}).get('status') == 'connected':
+                    # Still connected, update last check time
+                    active_qr_sessions.update(session_id, last_check=current_time)
+            except Exception as check_err:
+                # Error checking connection - might be temporary, try again next interval
+                _safe_log(f"Error checking connection: {str(check_err)}", "WhatsApp Keep-Alive", is_error=True)
+
+def _end_keep_alive(session_id, driver):
+    """Stop watching a session, unless it was re-registered with a different driver meanwhile"""
+    with _keep_alive_lock:
+        entry = _keep_alive_sessions.get(session_id)
+        if entry is not None and entry[0] is driver:
+            del _keep_alive_sessions[session_id]
+    _safe_log(f"Keep-alive ended for session: {session_id}", "WhatsApp Keep-Alive")
 
 def _get_qr_hash(qr_data_url):
     """Get a simple hash of QR data to detect changes"""
     if not qr_data_url:
         return None
     try:
-        # Use first 1000 chars of base64 data as hash (enough to detect changes)
-        data_part = qr_data_url[22:1022] if len(qr_data_url) > 1022 else qr_data_url[22:]
-        return hashlib.md5(data_part.encode()).hexdigest()
-    except:
+        # BLAKE2b over the whole ASCII payload: faster than MD5 and can't miss a change past a prefix
+        return hashlib.blake2b(qr_data_url.encode('ascii'), digest_size=8).hexdigest()
+    except Exception:
         return None
 
+# Flips window.__waConnected once any logged-in marker is attached to the DOM, so the
+# monitor only has to read one flag per tick instead of running several find_elements.
+# Installed on every new document via CDP so the flag survives reloads without Python re-injecting it
+_CONNECTION_OBSERVER_JS = """
+    (() => {
+        if (window.__waObserver) return;
+        const sel = '[data-testid="chat-list"], [data-testid="sidebar"], [data-testid="pane-side"]';
+        const check = () => {
+            if (document.querySelector(sel)) {
+                window.__waConnected = Date.now();
+                window.__waObserver.disconnect();
+            }
+        };
+        window.__waConnected = 0;
+        window.__waObserver = new MutationObserver(check);
+        window.__waObserver.observe(document, {childList: true, subtree: true});
+        check();
+    })();
+"""
+
+def _install_connection_observer(driver):
+    """Register the connection observer for every document this driver loads"""
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _CONNECTION_OBSERVER_JS})
+
+# QR payload from the container's data-ref attribute (null when no QR is shown); it changes exactly
+# when WhatsApp rotates the code, so it is a cheap "did the QR change" probe
+_QR_REF_JS = "const ref = document.querySelector('[data-ref]'); return ref ? ref.getAttribute('data-ref') : null;"
+
+# Connection flag, QR data-ref, whether the "Use here" takeover prompt is up and, when asked for
+# and the data-ref moved past arguments[0], the new QR as a lossless WebP data URL, all in one round-trip
+_MONITOR_STATE_JS = _CONNECTION_OBSERVER_JS + """
+    const ref = document.querySelector('[data-ref]');
+    const qrRef = ref ? ref.getAttribute('data-ref') : null;
+    const useHere = !!document.querySelector(
+        "[data-testid='use-here'], button[aria-label*='Use here'], button[aria-label*='Use Here']");
+    let qrData = null;
+    if (arguments[1] && qrRef && qrRef !== arguments[0]) {
+        const canvas = ref.querySelector('canvas') || document.querySelector('canvas[aria-label*="QR"]');
+        try {
+            qrData = canvas ? canvas.toDataURL('image/webp', 1) : null;
+        } catch (e) {
+            qrData = null;
+        }
+    }
+    return [!!window.__waConnected, qrRef, qrData, useHere];
+"""
+
+# Seconds between monitor state reads while waiting for a scan or a QR rotation
+MONITOR_POLL_FREQUENCY = 0.5
+
+def _read_monitor_state(driver, known_qr_ref=None, want_qr=False):
+    """Return (connected, qr_ref, qr_data, use_here) in one round-trip (installs the observer if the page predates it).
+
+    qr_data is only exported when want_qr is set and the data-ref differs from known_qr_ref.
+    """
+    connected, qr_ref, qr_data, use_here = driver.execute_script(_MONITOR_STATE_JS, known_qr_ref, want_qr)
+    return bool(connected), qr_ref, qr_data, use_here
+
+def _monitor_event(session_id, known_qr_ref):
+    """WebDriverWait condition: (connected, qr_ref, qr_data) once the page connected or showed a new QR, else False.
+
+    connected is None once the session no longer owns the driver (cleaned up or replaced).
+    """
+    def _check(driver):
+        if active_drivers.get(session_id) is not driver:
+            return None, None, None
+        try:
+            connected, qr_ref, qr_data, use_here = _read_monitor_state(driver, known_qr_ref, True)
+        except Exception:
+            return False
+        if use_here:
+            # Take the session over from another tab; the next poll sees the result
+            _try_click_use_here(driver)
+        if connected:
+            return True, qr_ref, None
+        if qr_ref == known_qr_ref:
+            return False
+        if not qr_data:
+            # data-ref moved but the canvas could not be exported (tainted or not drawn yet)
+            try:
+                _, qr_data = _read_visible_qr(driver)
+            except Exception:
+                # Transient WebDriver/JS failure: try again on the next poll instead of ending the monitor
+                return False
+            if not qr_data:
+                return False
+        return False, qr_ref, qr_data
+    return _check
+
+def _end_monitored_session(driver, session_id, status_data):
+    """Record a terminal status for an unscanned session and give its driver back"""
+    active_qr_sessions.set(session_id, status_data)
+    if active_drivers.get(session_id) is driver:
+        active_drivers.pop(session_id, None)
+    _release_driver(driver)
+
 def monitor_qr_scan(driver, session_id, session_dir=None, timeout=600):
     """Monitor for QR scan, connection, and QR code changes"""
+    _begin_log_buffer()
     try:
-        start_time = time.time()
-        last_qr_hash = None
-        qr_check_interval = 3  # Check QR every 3 seconds
-        connection_check_interval = 2  # Check connection every 2 seconds
-        last_qr_check = 0
-        last_connection_check = 0
+        deadline = time.time() + timeout
+        # Start from the QR already stored by the capture (or resume/bootstrap), so it isn't
+        # re-exported, rewritten and counted as a refresh on the first poll
+        stored = active_qr_sessions.get(session_id) or {}
+        last_qr = stored.get('qr_data')
+        last_qr_ref = stored.get('qr_ref')
+        last_qr_hash = stored.get('qr_hash') or _get_qr_hash(last_qr)
+        qr_refreshes = 0
 
         _safe_log(f"Starting QR monitor for session: {session_id}", "WhatsApp QR Monitor")
 
-        while time.time() - start_time < timeout:
-            current_time = time.time()
+        while True:
+            # Selenium does the polling; each poll is one state read, and we only wake up to act
+            wait = WebDriverWait(driver, max(0, deadline - time.time()), poll_frequency=MONITOR_POLL_FREQUENCY)
+            try:
+                connected, qr_ref, current_qr = wait.until(_monitor_event(session_id, last_qr_ref))
+            except TimeoutException:
+                break
 
-            # Check for connection more frequently
-            if current_time - last_connection_check >= connection_check_interval:
-                last_connection_check = current_time
-                try:
-                    # Try to resolve possible takeover prompt ("Use here")
-                    try:
-                        _try_click_use_here(driver)
-                    except Exception:
-                        pass
+            if connected is None:
+                # The driver was taken away; free the monitor slot instead of polling it until timeout
+                _safe_log(f"QR monitor detached for session: {session_id}", "WhatsApp QR Monitor")
+                return
+
+            if connected:
+                # Connected! Update session and keep driver alive
+                _safe_log(f"Connection detected for session: {session_id}", "WhatsApp Connection")
+                active_qr_sessions.set(session_id, {
+                    'status': 'connected',
+                    'connected_at': time.time(),
+                    'message': 'Successfully connected to WhatsApp',
+                    'session_dir': session_dir,
+                    'driver_active': True
+                })
+                # Don't quit driver - keep session alive
+                # Driver will be kept in active_drivers dict
+                # Hand the session to the shared keep-alive loop
+                _keep_session_alive(driver, session_id, session_dir)
+                return
+
+            # The QR container's data-ref carries the QR payload, so the next wait only
+            # fires once it moves again
+            last_qr_ref = qr_ref
+
+            # An identical string (length check, then memcmp) is the same QR; skip the hash
+            if current_qr == last_qr:
+                continue
+            last_qr = current_qr
+            # Check if QR has changed by comparing hash
+            current_hash = _get_qr_hash(current_qr)
+            if not current_hash or current_hash == last_qr_hash:
+                continue
+
+            if last_qr_hash is not None:
+                qr_refreshes += 1
+            if qr_refreshes > QR_MAX_REFRESHES:
+                # Nobody scanned the last few codes; free the browser instead of idling
+                _safe_log(f"QR expired after {QR_MAX_REFRESHES} unscanned refreshes: {session_id}", "WhatsApp QR Monitor")
+                _end_monitored_session(driver, session_id, {
+                    'status': 'expired',
+                    'message': 'QR code expired without being scanned - please try again'
+                })
+                return
+            # QR has changed, update session
+            _safe_log(f"QR code updated for session: {session_id}", "WhatsApp QR Update")
+            active_qr_sessions.set(session_id, {
+                'status': 'qr_ready',
+                'qr_data': current_qr,
+                'qr_ref': last_qr_ref,
+                'qr_hash': current_hash,
+                'generated_at': time.time(),
+                'driver_active': True,
+                'session_dir': session_dir
+            })
+            last_qr_hash = current_hash
 
-                    # Check if connected (multiple indicators)
-                    chat_list = driver.find_elements(By.CSS_SELECTOR, '[data-testid="chat-list"]')
-                    side_panel = driver.find_elements(By.CSS_SELECTOR, '[data-testid="sidebar"]')
-                    pane_side = driver.find_elements(By.CSS_SELECTOR, '[data-testid="pane-side"]')
-
-                    if chat_list or side_panel or pane_side:
-                        # Connected! Update session and keep driver alive
-                        _safe_log(f"Connection detected for session: {session_id}", "WhatsApp Connection")
-                        active_qr_sessions[session_id] = {
-                            'status': 'connected',
-                            'connected_at': time.time(),
-                            'message': 'Successfully connected to WhatsApp',
-                            'session_dir': session_dir,
-                            'driver_active': True
-                        }
-                        # Don't quit driver - keep session alive
-                        # Driver will be kept in active_drivers dict
-                        # Start a thread to keep session alive and monitor connection
-                        keep_alive_thread = threading.Thread(
-                            target=_keep_session_alive, 
-                            args=(driver, session_id, session_dir)
-                        )
-                        keep_alive_thread.daemon = True
-                        keep_alive_thread.start()
-                        return
-                except Exception as conn_check_err:
-                    # Not connected yet, continue monitoring
-                    pass
-            
-            # Check for QR changes less frequently but regularly
-            if current_time - last_qr_check >= qr_check_interval:
-                last_qr_check = current_time
-                try:
-                    # Check if QR element exists and get current QR
-                    qr_elements = driver.find_elements(By.CSS_SELECTOR, '[data-ref] canvas')
-                    
-                    if qr_elements and len(qr_elements) > 0:
-                        # QR element exists, extract current QR
-                        qr_element = qr_elements[0]
-                        current_qr = _extract_qr_from_canvas(driver, qr_element)
-                        
-                        if current_qr:
-                            # Check if QR has changed by comparing hash
-                            current_hash = _get_qr_hash(current_qr)
-                            
-                            if current_hash and current_hash != last_qr_hash:
-                                # QR has changed, update session
-                                _safe_log(f"QR code updated for session: {session_id}", "WhatsApp QR Update")
-                                active_qr_sessions[session_id] = {
-                                    'status': 'qr_ready',
-                                    'qr_data': current_qr,
-                                    'generated_at': time.time(),
-                                    'driver_active': True,
-                                    'session_dir': session_dir
-                                }
-                                last_qr_hash = current_hash
-                    else:
-                        # QR element not found - might be connecting or expired
-                        # Wait a bit and check again
-                        time.sleep(1)
-                        
-                except Exception as qr_check_err:
-                    # Error checking QR, log and continue
-                    _safe_log(f"QR check error: {str(qr_check_err)}", "WhatsApp QR Monitor")
-            
-            # Sleep briefly to avoid excessive CPU usage
-            time.sleep(0.5)
-            
         # Timeout reached
         _safe_log(f"QR monitor timeout for session: {session_id}", "WhatsApp QR Monitor")
-        active_qr_sessions[session_id] = {
+        _end_monitored_session(driver, session_id, {
             'status': 'timeout',
             'message': 'QR scan timeout - please try again'
-        }
-            
+        })
+
     except Exception as e:
-        _safe_log(f"QR Monitor Error: {str(e)}", "WhatsApp QR Monitor")
-        active_qr_sessions[session_id] = {
+        _safe_log(f"QR Monitor Error: {str(e)}", "WhatsApp QR Monitor", is_error=True)
+        active_qr_sessions.set(session_id, {
             'status': 'error',
             'error': str(e)
-        }
+        })
+    finally:
+        _flush_log_buffer("WhatsApp QR Monitor")
 
 
 def get_session_directory(session_id):
     """Get session directory for Chrome profile"""
+    cache_key = (getattr(frappe.local, "site", None), session_id)
+    cached = _session_dir_cache.get(cache_key)
+    if cached:
+        return cached
     try:
         # Use frappe.get_site_path() method correctly
         private_files = frappe.get_site_path('private', 'files')
         session_dir = os.path.join(private_files, 'whatsapp_sessions', session_id)
-        os.makedirs(session_dir, exist_ok=True)
+        if not os.path.isdir(session_dir):
+            os.makedirs(session_dir, exist_ok=True)
+        # Remember the directory so repeat requests skip get_site_path and the mkdir syscalls
+        _session_dir_cache[cache_key] = session_dir
         return session_dir
     except Exception as e:
         # Fallback to temp directory if site path fails
         import tempfile
         temp_dir = tempfile.mkdtemp(prefix=f"whatsapp_{session_id}_")
-        _safe_log(f"Site path failed, using temp: {str(e)}", "WhatsApp Session Dir")
+        _safe_log(f"Site path failed, using temp: {str(e)}", "WhatsApp Session Dir", is_error=True)
         return temp_dir
 
 @frappe.whitelist()
 def check_qr_status(session_id):
     """Check status of QR generation and return latest QR if available"""
-    if session_id in active_qr_sessions:
-        session_data = active_qr_sessions[session_id].copy()
+    session_data = active_qr_sessions.get(session_id)
+    if session_data:
 
         # If we have a live driver, proactively detect connection and update state
         if session_id in active_drivers:
@@ -845,11 +1682,11 @@ def check_qr_status(session_id):
 
                 # Check if already connected (fast path)
                 try:
-                    candidates = driver.find_elements(By.CSS_SELECTOR, "[data-testid='chat-list'], [data-testid='sidebar'], [data-testid='pane-side'], [data-testid='conversation-panel-body']")
+                    logged_in = _is_logged_in(driver)
                 except Exception:
-                    candidates = []
+                    logged_in = False
 
-                if candidates:
+                if logged_in:
                     updated = {
                         'status': 'connected',
                         'connected_at': session_data.get('connected_at') or time.time(),
@@ -857,34 +1694,43 @@ def check_qr_status(session_id):
                         'session_dir': session_data.get('session_dir') or None,
                         'message': 'Successfully connected to WhatsApp'
                     }
-                    active_qr_sessions[session_id] = updated
-                    # Ensure keep-alive is running (best-effort)
+                    active_qr_sessions.set(session_id, updated)
+                    # Ensure keep-alive is running (idempotent, so repeated polls don't add threads)
                     try:
-                        t = threading.Thread(target=_keep_session_alive, args=(driver, session_id, updated.get('session_dir')))
-                        t.daemon = True
-                        t.start()
+                        _keep_session_alive(driver, session_id, updated.get('session_dir'))
                     except Exception:
                         pass
-                    return active_qr_sessions[session_id].copy()
+                    return active_qr_sessions.get(session_id)
 
                 # Not connected yet; if QR is present, optionally refresh the QR image
                 try:
-                    qr_elements = driver.find_elements(By.CSS_SELECTOR, '[data-ref] canvas')
-                except Exception:
-                    qr_elements = []
-
-                if qr_elements:
-                    try:
-                        latest_qr = _extract_qr_from_canvas(driver, qr_elements[0])
+                    # Skip the canvas export while the QR's data-ref is the one already stored
+                    qr_ref = driver.execute_script(_QR_REF_JS)
+                    if not qr_ref or qr_ref != session_data.get('qr_ref'):
+                        _, latest_qr = _read_visible_qr(driver)
                         if latest_qr:
                             current_hash = _get_qr_hash(latest_qr)
-                            old_hash = _get_qr_hash(session_data.get('qr_data'))
+                            # Every writer of qr_data stores its hash too, so this is a lookup, not a rehash
+                            old_hash = session_data.get('qr_hash')
                             if current_hash != old_hash:
-                                session_data['qr_data'] = latest_qr
-                                session_data['generated_at'] = time.time()
-                                active_qr_sessions[session_id] = session_data
-                    except Exception:
-                        pass
+                                fields = {
+                                    'qr_data': latest_qr,
+                                    'qr_hash': current_hash,
+                                    'qr_ref': qr_ref,
+                                    'generated_at': time.time(),
+                                }
+                            else:
+                                # Same QR under a data-ref we hadn't stored yet: record it so the
+                                # next poll skips the export
+                                fields = {'qr_ref': qr_ref}
+                            # Partial write, and only while the session still shows a QR, so a
+                            # concurrent 'connected'/'expired' from the monitor is never overwritten
+                            if active_qr_sessions.update_if(session_id, 'qr_ready', **fields):
+                                session_data.update(fields)
+                            else:
+                                session_data = active_qr_sessions.get(session_id) or session_data
+                except Exception:
+                    pass
             except Exception:
                 pass
 
@@ -913,76 +1759,66 @@ def _bootstrap_session_status(session_id):
         driver_error = None
         for idx, headless_arg in enumerate(headless_modes):
             try:
-                chrome_options = _build_chrome_options(user_data_dir=session_dir, headless_mode=headless_arg)
-                service = ChromeService(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=chrome_options)
+                driver = _new_driver(user_data_dir=session_dir, headless_mode=headless_arg)
                 if idx > 0:
                     _safe_log(f"Bootstrap succeeded with fallback headless mode '{headless_arg}'", "WhatsApp Chrome Retry")
                 break
             except Exception as err:
                 driver_error = err
-                _safe_log(f"Bootstrap Chrome launch failed with headless mode '{headless_arg}': {err}", "WhatsApp Chrome Error")
+                _safe_log(f"Bootstrap Chrome launch failed with headless mode '{headless_arg}': {err}", "WhatsApp Chrome Error", is_error=True)
                 driver = None
         if driver is None:
             raise driver_error or Exception("Chrome could not be started for bootstrap")
-        driver.get("https://web.whatsapp.com")
+        driver.get(WHATSAPP_WEB_ORIGIN)
         time.sleep(5)
         try:
             _try_click_use_here(driver)
         except Exception:
             pass
         try:
-            candidates = driver.find_elements(By.CSS_SELECTOR, "[data-testid='chat-list'], [data-testid='sidebar'], [data-testid='pane-side'], [data-testid='conversation-panel-body']")
-            if candidates and len(candidates) > 0:
+            if _is_logged_in(driver):
                 active_drivers[session_id] = driver
-                active_qr_sessions[session_id] = {
+                active_qr_sessions.set(session_id, {
                     'status': 'connected',
                     'connected_at': time.time(),
                     'driver_active': True,
                     'session_dir': session_dir,
-                }
+                })
                 # Start keep-alive
                 try:
-                    t = threading.Thread(target=_keep_session_alive, args=(driver, session_id, session_dir))
-                    t.daemon = True
-                    t.start()
+                    _keep_session_alive(driver, session_id, session_dir)
                 except Exception:
                     pass
-                return active_qr_sessions[session_id].copy()
+                return active_qr_sessions.get(session_id)
         except Exception:
             pass
         # Not connected; check QR element
         try:
-            qr_el = None
-            selectors = ['[data-ref] canvas', 'canvas[aria-label*="QR"]', 'div[data-ref] canvas', 'canvas']
-            for sel in selectors:
-                els = driver.find_elements(By.CSS_SELECTOR, sel)
-                if els and len(els) > 0:
-                    for el in els:
-                        size = el.size
-                        if size.get('width', 0) > 200 and size.get('height', 0) > 200:
-                            qr_el = el
-                            break
-                if qr_el:
-                    break
-            if qr_el:
-                qr_data_url = _extract_qr_from_canvas(driver, qr_el)
+            # Size check and export happen in the page; element proxies are only needed for the
+            # screenshot fallback when the canvas could not be exported
+            qr_data_url = _evaluate_js(driver, _SIZED_QR_JS)
+            if not qr_data_url:
+                for el in driver.find_elements(*_QR_ANY_LOCATOR):
+                    size = el.size
+                    if size.get('width', 0) > 200 and size.get('height', 0) > 200:
+                        qr_data_url = _screenshot_crop_qr(driver, el)
+                        break
+            if qr_data_url:
                 active_drivers[session_id] = driver
-                active_qr_sessions[session_id] = {
+                active_qr_sessions.set(session_id, {
                     'status': 'qr_ready',
                     'qr_data': qr_data_url,
+                    'qr_hash': _get_qr_hash(qr_data_url),
                     'generated_at': time.time(),
                     'driver_active': True,
                     'session_dir': session_dir,
-                }
+                })
                 # Start monitor so that when user scans, status flips to connected
                 try:
-                    t = threading.Thread(target=monitor_qr_scan, args=(driver, session_id, session_dir))
-                    t.daemon = True
-                    t.start()
+                    _start_monitor(driver, session_id, session_dir)
                 except Exception:
                     pass
-                return active_qr_sessions[session_id].copy()
+                return active_qr_sessions.get(session_id)
         except Exception:
             pass
         try:
@@ -991,7 +1827,7 @@ def _bootstrap_session_status(session_id):
             pass
         return {'status': 'not_found'}
     except Exception as e:
-        _safe_log(f"Bootstrap status failed for {session_id}: {str(e)}", "WhatsApp QR Bootstrap")
+        _safe_log(f"Bootstrap status failed for {session_id}: {str(e)}", "WhatsApp QR Bootstrap", is_error=True)
         return {'status': 'error', 'message': str(e)}
 
 def _get_session_directory_path(session_id):
@@ -1009,41 +1845,17 @@ def _delete_session_directory(session_id, retry_count=3):
     try:
         # Get directory path without creating it
         session_dir = _get_session_directory_path(session_id)
-        
+
         if not session_dir:
             _safe_log(f"Could not determine session directory path for {session_id}", "WhatsApp Session Cleanup")
             return False
-        
-        # Check if directory exists
-        if not os.path.exists(session_dir):
-            return True  # Directory doesn't exist, consider it deleted
-        
-        # First, try to clean up lock files
-        lock_files_to_check = [
-            os.path.join(session_dir, "SingletonLock"),
-            os.path.join(session_dir, "SingletonSocket"),
-            os.path.join(session_dir, "SingletonCookie"),
-        ]
-        
-        default_profile = os.path.join(session_dir, "Default")
-        if os.path.exists(default_profile):
-            lock_files_to_check.extend([
-                os.path.join(default_profile, "SingletonLock"),
-                os.path.join(default_profile, "lockfile"),
-                os.path.join(default_profile, "LOCKFILE"),
-            ])
-        
-        # Remove lock files
-        for lock_path in lock_files_to_check:
-            if os.path.exists(lock_path):
-                try:
-                    if platform.system() == 'Windows':
-                        time.sleep(0.2)  # Wait longer on Windows
-                    os.remove(lock_path)
-                except Exception:
-                    pass  # Ignore lock file removal errors
-        
-        # Try to delete directory with retries
+
+        for cache_key, cached_dir in list(_session_dir_cache.items()):
+            if cached_dir == session_dir:
+                _session_dir_cache.pop(cache_key, None)
+
+        # One rmtree pass removes the Chrome lock files along with everything else; a lock that is
+        # still held surfaces as a PermissionError and goes through the retries below
         for attempt in range(retry_count):
             try:
                 if platform.system() == 'Windows':
@@ -1055,32 +1867,34 @@ def _delete_session_directory(session_id, retry_count=3):
                             func(path)
                         except Exception:
                             pass
-                    
+
                     shutil.rmtree(session_dir, onerror=handle_remove_readonly)
                 else:
                     shutil.rmtree(session_dir)
-                
+
                 _safe_log(f"Session directory deleted: {session_dir}", "WhatsApp Session Cleanup")
                 return True
-                
+
+            except FileNotFoundError:
+                return True  # Directory doesn't exist, consider it deleted
             except PermissionError:
                 if attempt < retry_count - 1:
                     time.sleep(0.5)  # Wait before retry
                     continue
                 else:
-                    _safe_log(f"Could not delete session directory (locked): {session_dir}", "WhatsApp Session Cleanup")
+                    _safe_log(f"Could not delete session directory (locked): {session_dir}", "WhatsApp Session Cleanup", is_error=True)
                     return False
             except Exception as e:
-                _safe_log(f"Error deleting session directory: {str(e)}", "WhatsApp Session Cleanup")
+                _safe_log(f"Error deleting session directory: {str(e)}", "WhatsApp Session Cleanup", is_error=True)
                 if attempt < retry_count - 1:
                     time.sleep(0.5)
                     continue
                 return False
-        
+
         return False
-        
+
     except Exception as e:
-        _safe_log(f"Error in _delete_session_directory: {str(e)}", "WhatsApp Session Cleanup")
+        _safe_log(f"Error in _delete_session_directory: {str(e)}", "WhatsApp Session Cleanup", is_error=True)
         return False
 
 @frappe.whitelist()
@@ -1088,24 +1902,32 @@ def cleanup_session(session_id, delete_directory=True, close_driver=True):
     """Clean up QR session from memory, close driver, and optionally delete session directory"""
     try:
         driver_closed = False
-        
-        # Close driver if requested and exists
-        if close_driver and session_id in active_drivers:
+
+        # Drop a capture or monitor that is still queued for a free slot
+        for futures in (_capture_futures, _monitor_futures):
+            future = futures.pop(session_id, None)
+            if future is not None:
+                future.cancel()
+
+        # Close driver if requested and exists; take it out of active_drivers first so the monitor
+        # and keep-alive loops stop using it before it can go back to the warm pool
+        driver = active_drivers.pop(session_id, None) if close_driver else None
+        if driver is not None:
             try:
-                driver = active_drivers[session_id]
-                driver.quit()
+                if delete_directory:
+                    # Chrome must be gone before its profile directory can be removed
+                    _release_driver(driver)
+                else:
+                    _quit_executor.submit(_release_driver, driver)
                 driver_closed = True
                 _safe_log(f"Driver closed for session: {session_id}", "WhatsApp Session Cleanup")
             except Exception as driver_err:
-                _safe_log(f"Error closing driver for session {session_id}: {str(driver_err)}", "WhatsApp Session Cleanup")
-            finally:
-                del active_drivers[session_id]
-        
+                _safe_log(f"Error closing driver for session {session_id}: {str(driver_err)}", "WhatsApp Session Cleanup", is_error=True)
+
         # Remove from active sessions
-        if session_id in active_qr_sessions:
-            del active_qr_sessions[session_id]
+        if active_qr_sessions.pop(session_id) is not None:
             _safe_log(f"Session removed from memory: {session_id}", "WhatsApp Session Cleanup")
-        
+
         # Delete session directory if requested
         directory_deleted = False
         if delete_directory:
@@ -1114,18 +1936,18 @@ def cleanup_session(session_id, delete_directory=True, close_driver=True):
             if deleted:
                 _safe_log(f"Session directory deleted for: {session_id}", "WhatsApp Session Cleanup")
             else:
-                _safe_log(f"Could not delete session directory for: {session_id}", "WhatsApp Session Cleanup")
-        
+                _safe_log(f"Could not delete session directory for: {session_id}", "WhatsApp Session Cleanup", is_error=True)
+
         return {
             'success': True,
             'message': f'Session {session_id} cleaned up successfully',
             'driver_closed': driver_closed,
             'directory_deleted': directory_deleted
         }
-            
+
     except Exception as e:
         error_msg = str(e)
-        _safe_log(f"Error cleaning up session {session_id}: {error_msg}", "WhatsApp Session Cleanup")
+        _safe_log(f"Error cleaning up session {session_id}: {error_msg}", "WhatsApp Session Cleanup", is_error=True)
         return {
             'success': False,
             'error': error_msg
@@ -1138,39 +1960,38 @@ def cleanup_old_sessions(older_than_days=7, delete_directories=True):
         cleaned_count = 0
         deleted_dirs = 0
         errors = []
-        
+
         # Get all session directories
         try:
             private_files = frappe.get_site_path('private', 'files')
             sessions_base_dir = os.path.join(private_files, 'whatsapp_sessions')
-            
+
             if not os.path.exists(sessions_base_dir):
                 return {
                     'success': True,
                     'message': 'No sessions directory found',
                     'cleaned_count': 0
                 }
-            
+
             # Get current time
             current_time = time.time()
             cutoff_time = current_time - (older_than_days * 24 * 60 * 60)
-            
-            # Iterate through session directories
-            for session_id in os.listdir(sessions_base_dir):
-                session_dir = os.path.join(sessions_base_dir, session_id)
-                
-                if not os.path.isdir(session_dir):
-                    continue
-                
+
+            # Iterate through session directories; scandir entries carry the type, so only the
+            # mtime costs a stat
+            with os.scandir(sessions_base_dir) as entries:
+                session_entries = [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+            for entry in session_entries:
+                session_id = entry.name
+
                 # Check if session is old
                 try:
-                    dir_mtime = os.path.getmtime(session_dir)
+                    dir_mtime = entry.stat(follow_symlinks=False).st_mtime
                     if dir_mtime < cutoff_time:
                         # Session is old, clean it up
-                        if session_id in active_qr_sessions:
-                            del active_qr_sessions[session_id]
+                        if active_qr_sessions.pop(session_id) is not None:
                             cleaned_count += 1
-                        
+
                         if delete_directories:
                             if _delete_session_directory(session_id):
                                 deleted_dirs += 1
@@ -1178,7 +1999,7 @@ def cleanup_old_sessions(older_than_days=7, delete_directories=True):
                                 errors.append(f"Could not delete directory for session {session_id}")
                 except Exception as e:
                     errors.append(f"Error processing session {session_id}: {str(e)}")
-            
+
             return {
                 'success': True,
                 'cleaned_count': cleaned_count,
@@ -1186,15 +2007,15 @@ def cleanup_old_sessions(older_than_days=7, delete_directories=True):
                 'errors': errors if errors else None,
                 'message': f'Cleaned up {cleaned_count} old sessions, deleted {deleted_dirs} directories'
             }
-            
+
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e)
             }
-            
+
     except Exception as e:
-        _safe_log(f"Error in cleanup_old_sessions: {str(e)}", "WhatsApp Session Cleanup")
+        _safe_log(f"Error in cleanup_old_sessions: {str(e)}", "WhatsApp Session Cleanup", is_error=True)
         return {
             'success': False,
             'error': str(e)
@@ -1202,17 +2023,31 @@ def cleanup_old_sessions(older_than_days=7, delete_directories=True):
 
 @frappe.whitelist()
 def health_check_real():
-    """Health check for real QR service"""
+    """Health check for real QR service.
+
+    Launching Chrome costs seconds, so a successful probe is cached for
+    HEALTH_CHECK_TTL. A failed probe is not cached, so a fix shows up on the
+    next check.
+    """
+    cached = _health_cache.get('result')
+    if cached and time.time() - _health_cache['ts'] < HEALTH_CHECK_TTL:
+        result = dict(cached)
+        result['active_sessions'] = len(active_qr_sessions)
+        result['timestamp'] = frappe.utils.now()
+        return result
+    result = _probe_chrome_health()
+    if result.get('chrome_available'):
+        _health_cache['result'] = result
+        _health_cache['ts'] = time.time()
+    return result
+
+def _probe_chrome_health():
+    """Launch and quit a headless Chrome to verify the setup works"""
     try:
-        # Test Chrome availability
-        chrome_options = Options()
-        chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--no-sandbox")
-        
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.quit()
-        
+        # Test Chrome availability; the probe driver is kept warm in the pool
+        driver = _new_driver()
+        _release_driver(driver)
+
         return {
             'status': 'WhatsApp Real QR Service Ready',
             'chrome_available': True,
@@ -1235,6 +2070,14 @@ def send_message_persistent(session_id, phone_number, message):
     Requires that session_id exists in active_drivers (i.e., device linked and kept alive).
     """
     try:
+        # Enter on an empty compose box sends nothing, so don't report that as a
+        # success (checked before a driver is ensured, which may launch Chrome)
+        if not (message or '').strip():
+            return {
+                'success': False,
+                'error': 'Message is empty'
+            }
+
         # Ensure we have a live driver for this session (workers may differ per request)
         if session_id not in active_drivers:
             ensured = _ensure_driver_for_session(session_id)
@@ -1254,15 +2097,14 @@ def send_message_persistent(session_id, phone_number, message):
                 'error': 'Invalid destination number'
             }
 
-        text = urllib.parse.quote(message or '')
-        chat_url = f"https://web.whatsapp.com/send?phone={dest}&text={text}"
-        driver.get(chat_url)
+        # Open the chat without a prefilled text: no URL-length cap and no query-string re-render
+        driver.get(f"{WHATSAPP_WEB_ORIGIN}/send?phone={dest}")
 
-        wait = WebDriverWait(driver, 15)
-        send_button = wait.until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "[data-testid='send']"))
-        )
-        send_button.click()
+        # Poll at the shared frequency so typing starts as soon as the chat has rendered
+        wait = WebDriverWait(driver, 15, poll_frequency=WAIT_POLL_FREQUENCY)
+        compose = wait.until(EC.element_to_be_clickable(_COMPOSE_LOCATOR))
+        compose.click()
+        _type_and_send(driver, compose, message)
 
         return {
             'success': True,
@@ -1276,6 +2118,28 @@ def send_message_persistent(session_id, phone_number, message):
             'error': str(e)
         }
 
+# Message box of the open chat (focused by WhatsApp once the chat loads)
+_COMPOSE_LOCATOR = (By.CSS_SELECTOR, "footer div[contenteditable='true']")
+
+def _type_and_send(driver, compose, message):
+    """Put the whole message into the focused compose box in one input event and press Enter"""
+    if hasattr(driver, "execute_cdp_cmd"):
+        driver.execute_cdp_cmd("Input.insertText", {"text": message})
+        # Same key sequence Chrome produces for a physical Enter (keyDown carries a carriage-return text)
+        driver.execute_cdp_cmd("Input.dispatchKeyEvent", {
+            "type": "keyDown", "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13, "text": "\r",
+        })
+        driver.execute_cdp_cmd("Input.dispatchKeyEvent", {
+            "type": "keyUp", "key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13,
+        })
+        return
+    # Remote (grid) drivers have no CDP channel; type through WebDriver instead.
+    # A bare "\n" would be typed as Enter and send the message early, so line
+    # breaks go in as Shift+Enter (NULL releases Shift before the next line).
+    lines = message.replace("\r\n", "\n").split("\n")
+    compose.send_keys((Keys.SHIFT + Keys.ENTER + Keys.NULL).join(lines))
+    compose.send_keys(Keys.ENTER)
+
 def _ensure_driver_for_session(session_id):
     """Ensure a Chrome driver is running and logged-in for the given session_id.
 
@@ -1299,41 +2163,37 @@ def _ensure_driver_for_session(session_id):
         launch_error = None
         for idx, headless_arg in enumerate(headless_modes):
             try:
-                chrome_options = _build_chrome_options(user_data_dir=session_dir, headless_mode=headless_arg)
-                service = ChromeService(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=chrome_options)
+                driver = _new_driver(user_data_dir=session_dir, headless_mode=headless_arg)
                 if idx > 0:
                     _safe_log(f"Driver ensure succeeded with fallback headless mode '{headless_arg}'", "WhatsApp Chrome Retry")
                 break
             except Exception as err:
                 launch_error = err
-                _safe_log(f"Driver ensure failed with headless mode '{headless_arg}': {err}", "WhatsApp Chrome Error")
+                _safe_log(f"Driver ensure failed with headless mode '{headless_arg}': {err}", "WhatsApp Chrome Error", is_error=True)
                 driver = None
         if driver is None:
             raise launch_error or Exception("Chrome could not be started for session ensure")
 
         try:
-            driver.get("https://web.whatsapp.com")
+            driver.get(WHATSAPP_WEB_ORIGIN)
             # small settle time
             time.sleep(2)
             # Check if connected by locating chat list/sidebar
-            wait = WebDriverWait(driver, 10)
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "[data-testid='chat-list'], [data-testid='sidebar'], [data-testid='pane-side'], [data-testid='conversation-panel-body']")))
+            wait = WebDriverWait(driver, 10, poll_frequency=WAIT_POLL_FREQUENCY)
+            wait.until(EC.presence_of_element_located(_LOGGED_IN_LOCATOR))
 
             # Mark connected in session map
             active_drivers[session_id] = driver
-            active_qr_sessions[session_id] = {
+            active_qr_sessions.set(session_id, {
                 'status': 'connected',
                 'connected_at': time.time(),
                 'driver_active': True,
                 'session_dir': session_dir,
-            }
+            })
 
             # Kick off keep-alive in background
             try:
-                keep_alive_thread = threading.Thread(target=_keep_session_alive, args=(driver, session_id, session_dir))
-                keep_alive_thread.daemon = True
-                keep_alive_thread.start()
+                _keep_session_alive(driver, session_id, session_dir)
             except Exception:
                 pass
 
@@ -1347,7 +2207,7 @@ def _ensure_driver_for_session(session_id):
             return False
 
     except Exception as e:
-        _safe_log(f"Ensure driver failed for {session_id}: {str(e)}", "WhatsApp Driver Ensure")
+        _safe_log(f"Ensure driver failed for {session_id}: {str(e)}", "WhatsApp Driver Ensure", is_error=True)
         return False
 
 def _try_click_use_here(driver):
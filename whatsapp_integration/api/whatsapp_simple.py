@@ -1,8 +1,34 @@
+import base64
+import io
+from functools import lru_cache
+
 import frappe
 import qrcode
-import io
-import base64
-from PIL import Image
+from qrcode.image.svg import SvgPathFillImage
+
+
+@lru_cache(maxsize=256)
+def _render_qr_data_url(url):
+    """Render url as a QR data URL; the output only depends on url, so it is memoized"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    # One SVG <path> over the modules on a white fill (like back_color="white" before): ~1KB of
+    # text, no raster render or PNG encode
+    img = qr.make_image(image_factory=SvgPathFillImage)
+
+    # Convert to base64 data URL
+    buffer = io.BytesIO()
+    img.save(buffer)
+    img_str = base64.b64encode(buffer.getvalue()).decode()
+
+    return f"data:image/svg+xml;base64,{img_str}"
 
 @frappe.whitelist()
 def generate_simple_qr_code(session_id):
@@ -10,34 +36,17 @@ def generate_simple_qr_code(session_id):
     try:
         # For now, generate a placeholder QR that points to WhatsApp Web
         whatsapp_url = f"https://web.whatsapp.com/"
-        
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(whatsapp_url)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to base64 data URL
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        
-        qr_data_url = f"data:image/png;base64,{img_str}"
-        
+
+        # Constant URL, so every call after the first is a cache hit
+        qr_data_url = _render_qr_data_url(whatsapp_url)
+
         return {
             'status': 'qr_generated',
             'qr': qr_data_url,
             'session': session_id,
             'message': 'Simple QR generated. Please visit https://web.whatsapp.com manually to scan.'
         }
-        
+
     except Exception as e:
         frappe.log_error(f"Simple QR Generation Error: {str(e)}", "WhatsApp Simple QR")
         return {
@@ -60,10 +69,11 @@ def check_chrome_available():
     try:
         from selenium import webdriver
         from selenium.webdriver.chrome.options import Options
-        from webdriver_manager.chrome import ChromeDriverManager
-        
-        # Try to get Chrome driver path
-        ChromeDriverManager().install()
+
+        from whatsapp_integration.api.whatsapp_real_qr import resolve_chromedriver
+
+        # Try to get Chrome driver path (memoized, so repeat checks are free)
+        resolve_chromedriver()
         return True
     except Exception:
         return False